@@ -1,71 +1,147 @@
+import sys
+
+if __name__ == "__main__" and sys.argv[1:2] == ["report"]:
+    # Отчёт из командной строки: до импорта tkinter и matplotlib
+    from skillreport import main
+    sys.exit(main(sys.argv[2:]))
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import tkinter.font as tkfont
 import datetime
-import re
+import multiprocessing
 import os
-import matplotlib.dates as mdates
+import queue
+import threading
+import types
+import skillperf
+from skillcache import ParseCache
+from skilllog import SKILL_LOG_RE, LoadCancelled, LogSet, character_name, discover_skill_logs
+from skillstore import DAY, EventStore, next_target, to_datetime
+from skillwatch import LogWatcher
 
-# --- Парсер лог-файла ---
-def parse_log_file(filepath):
-    encodings = ['utf-8', 'cp1251', 'latin1']
-    content = None
-    for enc in encodings:
-        try:
-            with open(filepath, encoding=enc) as f:
-                content = f.readlines()
-            break
-        except Exception:
-            continue
-    if content is None:
-        raise Exception("Не удалось прочитать файл в поддерживаемых кодировках.")
-
-    date_start = None
-    events = []
-    date_re = re.compile(r'^Logging started (\d{4}-\d{2}-\d{2})')
-    event_re = re.compile(
-        r'^\[(\d{2}):(\d{2}):(\d{2})\] (.+?) increased by ([\d,]+) to ([\d,]+)'
-    )
-
-    for line in content:
-        line = line.strip()
-        m = date_re.match(line)
-        if m:
-            date_start = m.group(1)
-            continue
-        m = event_re.match(line)
-        if m and date_start:
-            h, mi, s = map(int, m.groups()[:3])
-            skill = m.group(4)
-            inc = float(m.group(5).replace(',', '.'))
-            newval = float(m.group(6).replace(',', '.'))
-            dt = datetime.datetime.strptime(
-                f"{date_start} {h:02d}:{mi:02d}:{s:02d}", "%Y-%m-%d %H:%M:%S"
+# Ряд графика прореживается до ширины холста в пикселях (точка на пиксель),
+# но не меньше MIN_PLOT_POINTS, пока окно ещё не показано.
+# MAX_PLOT_POINTS — для рядов без окна (замеры)
+MIN_PLOT_POINTS = 200
+MAX_PLOT_POINTS = 1000
+# Размер фигуры нового окна графика: дюймы и точек на дюйм
+PLOT_SIZE = (7, 4)
+PLOT_DPI = 100
+# Открытых окон графиков не больше, следующий график рисуется в самом старом
+MAX_PLOT_WINDOWS = 6
+MAX_DASHBOARD_SKILLS = 10
+# Окно истории: сколько последних дней показывать и какие показатели итогов
+HISTORY_DAYS = ["7", "30", "90", "365"]
+HISTORY_VIEWS = {"Карта по часам": "heatmap", "Прирост по дням": "daily"}
+HISTORY_METRICS = {"Прирост": "gain", "Активность, мин": "active", "События": "events"}
+ALL_SKILLS = "Все скиллы"
+# Запросы обновления за это время (мс) сливаются в один пересчёт
+UPDATE_DELAY = 30
+# Пауза между событиями (мин), после которой начинается новая сессия
+SESSION_GAP = 30
+# Пауза (мин), которая не входит в активное время при оценке скорости для ETA в таблице;
+# на графике — его "Макс. разрыв"
+RATE_GAP = 1
+# Пункт списка дат: сессии за всё время
+ALL_DATES = "Все даты"
+# Через сколько мс после появления окна начинать фоновую загрузку matplotlib
+PLOT_PREWARM_DELAY = 300
+# Для замера запуска: окно закрывается, как только Tk впервые простаивает
+STARTUP_PROBE = os.environ.get("SKILLVIEWER_STARTUP_PROBE")
+
+# --- Графики ---
+# matplotlib и NumPy нужны только для окна графика и загружаются при первом
+# обращении (или заранее в фоновом потоке), а не при запуске программы
+plot_lock = threading.Lock()
+plot_modules = None
+
+
+def plotting():
+    global plot_modules
+    with plot_lock:
+        if plot_modules is None:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            import matplotlib.dates as mdates
+            import skillrates
+            plot_modules = types.SimpleNamespace(
+                Figure=Figure, FigureCanvasTkAgg=FigureCanvasTkAgg,
+                mdates=mdates, skillrates=skillrates
             )
-            events.append({
-                'datetime': dt,
-                'skill': skill,
-                'increase': inc,
-                'new_value': newval
-            })
-    return events
+    return plot_modules
+
+
+def prewarm_plotting():
+    threading.Thread(target=plotting, daemon=True).start()
+
+
+def format_eta(hours):
+    if hours is None:
+        return "—"
+    minutes = round(hours * 60)
+    if minutes >= 100 * 60:
+        return f"{minutes // (24 * 60)} д {minutes // 60 % 24} ч"
+    return f"{minutes // 60} ч {minutes % 60:02d} мин"
+
+
+def format_rate(rate):
+    return "—" if rate is None else f"{rate:.4f}/ч"
+
 
 # --- GUI ---
 class SkillViewerApp(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Wurm Online Skill Log Viewer")
-        self.events = []
-        self.filtered_events = []
+        self.store = EventStore()
+        self.filtered_events = []  # индексы событий в self.store
+        self.parse_cache = ParseCache()
         self.dates = []
+        self.session_gap = SESSION_GAP
+        # Фоновая задача (загрузка или дочитывание лога): одновременно не больше одной
+        self.job_queue = queue.Queue()
+        self.job_id = 0
+        self.job_cancel = None
+        self.job_handlers = None
+        self.job_busy = False
+        self.job_reading = False  # задача дочитывает логи: её отмена потеряла бы новые события
+        self.job_polling = False
+        # Слежение за логами: один поток LogWatcher на все открытые логи сообщает
+        # об изменениях событием <<LogChanged>>, изменившиеся файлы копятся в changed_paths
+        self.log_watcher = None
+        self.log_update_pending = False
+        self.changed_paths = set()
+        self.changed_lock = threading.Lock()
+        # Другие персонажи, за логами которых тоже следим: имя -> LogSet
+        self.characters = {}
+        self.characters_win = None
+        # Отложенные обновления: что устарело и какие графики перерисовать (None — все)
+        self.dirty = set()
+        self.dirty_plot_skills = set()
+        self.update_id = None
+        # Состояние таблицы: строки обновляются точечно, а не пересоздаются
+        self.tree_items = {}      # скилл -> id строки в Treeview
+        self.table_data = {}      # скилл -> (прирост, итоговое значение)
+        self.table_values = {}    # скилл -> отображаемые значения ячеек
+        self.table_order = []     # скиллы в порядке строк таблицы
+        self.table_eta = {}       # скилл -> часов до цели (None — скилл не растёт)
+        self.sort_state = ("increase", True)  # по умолчанию — по приросту по убыванию
+        self.text_widths = {}     # текст -> ширина в пикселях
+        self.column_widths = {}
         self.create_widgets()
         self.update_idletasks()
         self.minsize(self.winfo_width(), self.winfo_height())
         self.active_plots = []  # список: [{"win": ..., "params": {...}}, ...]
+        # Скрытое окно замеров (F12)
+        self.perf_win = None
+        self.history = None  # окно истории по часам и дням: {"win": ..., "fig": ..., ...}
+        self.bind_all("<F12>", lambda e: self.toggle_perf_window())
         self.update_always_on_top()
         self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.bind("<<LogChanged>>", lambda e: self.check_log_update())
+        if not STARTUP_PROBE:
+            self.after(PLOT_PREWARM_DELAY, prewarm_plotting)
 
     def create_widgets(self):
         # --- Первая строка: Кнопка выбора файла и дата , Отображать график---
@@ -73,22 +149,36 @@ class SkillViewerApp(tk.Tk):
         file_date_frame.pack(fill=tk.X, padx=5, pady=2)
         self.btn_open = tk.Button(file_date_frame, text="Выбрать лог-файл", command=self.open_file)
         self.btn_open.pack(side=tk.LEFT, padx=5)
+        self.btn_open_folder = tk.Button(file_date_frame, text="Открыть папку логов", command=self.open_folder)
+        self.btn_open_folder.pack(side=tk.LEFT, padx=(0, 5))
         tk.Label(file_date_frame, text="Дата:").pack(side=tk.LEFT)
         self.date_var = tk.StringVar()
         self.date_menu = ttk.Combobox(file_date_frame, textvariable=self.date_var, state="readonly")
         self.date_menu.pack(side=tk.LEFT, padx=5)
-        self.date_menu.bind("<<ComboboxSelected>>", self.on_date_selected)
+        # Смена даты, сессии или паузы меняет выбранную сессию — графики перестраиваются по ней
+        self.date_menu.bind("<<ComboboxSelected>>", lambda e: [self.on_date_selected(), self.schedule("filter", "plots")])
         self.btn_plot = tk.Button(file_date_frame, text="Отображать график", command=self.show_skill_plot)
         self.btn_plot.pack(side=tk.RIGHT, padx=5)
+        self.btn_history = tk.Button(file_date_frame, text="История", command=self.show_history)
+        self.btn_history.pack(side=tk.RIGHT)
+        self.btn_characters = tk.Button(file_date_frame, text="Персонажи", command=self.show_characters)
+        self.btn_characters.pack(side=tk.RIGHT, padx=5)
 
         # --- Вторая строка: Сессия и время , Отображать поверх---
         session_time_frame = tk.Frame(self)
         session_time_frame.pack(fill=tk.X, padx=5, pady=2)
 
         tk.Label(session_time_frame, text="Сессия:").pack(side=tk.LEFT)
-        self.sessions_combo = ttk.Combobox(session_time_frame, state="readonly", width=15)
+        self.sessions_combo = ttk.Combobox(session_time_frame, state="readonly", width=24)
         self.sessions_combo.pack(side=tk.LEFT, padx=2)
-        self.sessions_combo.bind("<<ComboboxSelected>>", lambda e: [self.on_session_selected(), self.apply_filters()])
+        self.sessions_combo.bind("<<ComboboxSelected>>", lambda e: [self.on_session_selected(), self.schedule("filter", "plots")])
+
+        tk.Label(session_time_frame, text="Пауза (мин):").pack(side=tk.LEFT, padx=(10, 0))
+        self.session_gap_var = tk.StringVar(value=str(self.session_gap))
+        self.session_gap_entry = tk.Entry(session_time_frame, textvariable=self.session_gap_var, width=4)
+        self.session_gap_entry.pack(side=tk.LEFT, padx=2)
+        self.session_gap_entry.bind("<Return>", self.on_gap_changed)
+        self.session_gap_entry.bind("<FocusOut>", self.on_gap_changed)
 
         tk.Label(session_time_frame, text="Время от:").pack(side=tk.LEFT, padx=(10, 0))
         self.time_from_var = tk.StringVar(value="00:00")
@@ -105,19 +195,21 @@ class SkillViewerApp(tk.Tk):
         self.use_time_filter_var = tk.BooleanVar(value=False)
         self.cb_use_time_filter = tk.Checkbutton(
             session_time_frame, text="Фильтровать по времени",
-            variable=self.use_time_filter_var, command=self.apply_filters
+            variable=self.use_time_filter_var, command=lambda: self.schedule("filter")
         )
         self.cb_use_time_filter.pack(side=tk.LEFT, padx=10)
 
         # --- Таблица ---
-        columns = ("skill", "increase", "new_value")
+        columns = ("skill", "increase", "new_value", "eta")
         self.tree = ttk.Treeview(self, columns=columns, show="headings", height=10)
         self.tree.heading("skill", text="Скилл", command=lambda: self.sort_column("skill", False))
         self.tree.heading("increase", text="Прирост", command=lambda: self.sort_column("increase", False))
         self.tree.heading("new_value", text="Итоговое значение", command=lambda: self.sort_column("new_value", False))
+        self.tree.heading("eta", text="До цели", command=lambda: self.sort_column("eta", False))
         self.tree.column("skill", width=200)
         self.tree.column("increase", width=100)
         self.tree.column("new_value", width=120)
+        self.tree.column("eta", width=90)
         self.tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # --- Нижняя панель: чекбокс и версия в одной строке ---
@@ -131,6 +223,19 @@ class SkillViewerApp(tk.Tk):
         )
         self.cb_always_on_top.pack(side=tk.LEFT)
 
+        # Цель для ETA; пусто — следующий целый уровень скилла
+        tk.Label(bottom_frame, text="Цель:").pack(side=tk.LEFT, padx=(10, 0))
+        self.target_var = tk.StringVar()
+        self.target_entry = tk.Entry(bottom_frame, textvariable=self.target_var, width=6)
+        self.target_entry.pack(side=tk.LEFT, padx=2)
+        self.target_entry.bind("<Return>", lambda e: self.schedule("filter", "plots"))
+        self.target_entry.bind("<FocusOut>", lambda e: self.schedule("filter", "plots"))
+
+        # Ход загрузки, показывается только пока идёт разбор
+        self.status_var = tk.StringVar()
+        self.status_label = tk.Label(bottom_frame, textvariable=self.status_var)
+        self.progress_bar = ttk.Progressbar(bottom_frame, length=150, maximum=1.0)
+
         author_label = tk.Label(bottom_frame, text="By Vamashi v1.1", anchor="e")
         author_label.pack(side=tk.RIGHT)
 
@@ -141,174 +246,455 @@ class SkillViewerApp(tk.Tk):
         )
         if not filepath:
             return
-        try:
-            self.events = parse_log_file(filepath)
-            if not self.events:
-                messagebox.showwarning("Внимание", "В файле не найдено событий.")
-                return
-            self.dates = sorted(list({e['datetime'].date() for e in self.events}), reverse=True)
-            self.date_menu['values'] = [str(d) for d in self.dates]
-            self.date_var.set(str(self.dates[0]))
-            self.time_from_var.set("00:00")
-            self.time_to_var.set("23:59")
-            self.log_filepath = filepath
-            self.log_last_mtime = os.path.getmtime(filepath)
-            self.start_log_monitor()
-            self.apply_filters()
-        except Exception as e:
-            messagebox.showerror("Ошибка", str(e))
+        self.open_logs([filepath])
 
-    def start_log_monitor(self):
-        self.after(1000, self.check_log_update)
+    def open_folder(self):
+        # Все помесячные логи скиллов персонажа сразу
+        folder = filedialog.askdirectory(title="Выберите папку с логами персонажа")
+        if not folder:
+            return
+        paths = discover_skill_logs(folder)
+        if not paths:
+            messagebox.showwarning("Внимание", "В папке не найдено логов скиллов (_Skills*.txt).")
+            return
+        self.open_logs(paths)
 
-    def check_log_update(self):
-        if hasattr(self, 'log_filepath') and self.log_filepath:
+    def open_logs(self, paths):
+        # Разбор идёт в фоне; выбор другого файла отменяет текущую загрузку
+        if self.job_busy and self.job_reading:
+            self.after(200, self.open_logs, paths)
+            return
+        log_set = LogSet(paths, self.parse_cache)
+        gap = self.session_gap
+
+        def work(progress, cancel):
+            store = log_set.load(progress, cancel)
+            # Индекс сессий и накопленные суммы по скиллам тоже строим в фоне
+            store.session_index(gap)
+            store.skill_totals()
+            store.rollups()
+            store.rate_tracker(RATE_GAP).update_all()
+            return store
+
+        self.show_progress("Загрузка...")
+        self.run_job(work, lambda store: self.on_logs_loaded(log_set, store), self.on_load_error)
+
+    def on_logs_loaded(self, log_set, store):
+        self.show_progress(None)
+        if not len(store):
+            messagebox.showwarning("Внимание", "В файле не найдено событий.")
+            return
+        self.store = store
+        self.dates = sorted(self.store.session_index(self.session_gap).dates(), reverse=True)
+        self.date_menu['values'] = [ALL_DATES] + [str(d) for d in self.dates]
+        self.date_var.set(str(self.dates[0]))
+        self.time_from_var.set("00:00")
+        self.time_to_var.set("23:59")
+        self.log_set = log_set
+        # Персонаж открыт как основной — отдельно за ним больше не следим
+        duplicate = self.characters.pop(character_name(log_set.paths), None)
+        if duplicate:
+            duplicate.save()
+        self.start_log_monitor()
+        self.schedule("filter", "characters")
+
+    def on_load_error(self, error):
+        self.show_progress(None)
+        messagebox.showerror("Ошибка", str(error))
+
+    def show_progress(self, text):
+        if text is None:
+            self.status_label.pack_forget()
+            self.progress_bar.pack_forget()
+            return
+        self.status_var.set(text)
+        self.progress_bar['value'] = 0
+        self.status_label.pack(side=tk.LEFT, padx=(10, 2))
+        self.progress_bar.pack(side=tk.LEFT)
+
+    # --- Фоновые задачи ---
+    def run_job(self, work, on_done, on_error=None):
+        # work(progress, cancel) выполняется в отдельном потоке и не трогает виджеты,
+        # on_done(result) и on_error(error) вызываются в главном потоке.
+        # Новая задача отменяет предыдущую, ответы отменённых задач игнорируются.
+        if self.job_cancel:
+            self.job_cancel.set()
+        self.job_id += 1
+        job_id = self.job_id
+        cancel = self.job_cancel = threading.Event()
+        self.job_handlers = (on_done, on_error)
+        self.job_busy = True
+        self.job_reading = False
+        jobs = self.job_queue
+
+        def target():
             try:
-                mtime = os.path.getmtime(self.log_filepath)
-                if mtime != getattr(self, 'log_last_mtime', None):
-                    self.log_last_mtime = mtime
-                    self.events = parse_log_file(self.log_filepath)
-                    self.apply_filters()  # <-- обновляет таблицу!
-                if self.active_plots:
-                    self.refresh_active_plot()
-            except Exception:
+                result = work(lambda fraction: jobs.put((job_id, 'progress', fraction)), cancel)
+                jobs.put((job_id, 'done', result))
+            except LoadCancelled:
                 pass
-        self.after(1000, self.check_log_update)
+            except Exception as e:
+                jobs.put((job_id, 'error', e))
 
-    def apply_filters(self):
-        if not self.events:
-            return
-        date_str = self.date_var.get()
+        threading.Thread(target=target, daemon=True).start()
+        if not self.job_polling:
+            self.job_polling = True
+            self.after(50, self.process_jobs)
+
+    def process_jobs(self):
+        while True:
+            try:
+                job_id, kind, value = self.job_queue.get_nowait()
+            except queue.Empty:
+                break
+            if job_id != self.job_id:
+                continue
+            if kind == 'progress':
+                self.progress_bar['value'] = value
+                continue
+            self.job_busy = False
+            on_done, on_error = self.job_handlers
+            if kind == 'done':
+                on_done(value)
+            elif on_error:
+                on_error(value)
+        if self.job_busy:
+            self.after(50, self.process_jobs)
+        else:
+            self.job_polling = False
+            if self.log_update_pending:
+                self.check_log_update()
+
+    def monitored_log_sets(self):
+        # Основной лог и логи других персонажей
+        main = [self.log_set] if getattr(self, 'log_set', None) else []
+        return main + list(self.characters.values())
+
+    def start_log_monitor(self):
+        # Один наблюдатель на файлы, в которые пишет игра, у всех персонажей;
+        # прежний наблюдатель останавливается
+        if self.log_watcher:
+            self.log_watcher.stop()
+            self.log_watcher = None
+        paths = [log_set.follower.filepath for log_set in self.monitored_log_sets()]
+        if paths:
+            # Новые логи в папках персонажей (начало месяца) тоже сообщаются
+            self.log_watcher = LogWatcher(paths, self.notify_log_changed, SKILL_LOG_RE)
+            self.log_watcher.start()
+
+    def notify_log_changed(self, paths):
+        # Вызывается из потока наблюдателя: файлы запоминаются, в главный поток идёт только событие
+        with self.changed_lock:
+            self.changed_paths |= paths
         try:
-            date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        except Exception:
+            self.event_generate("<<LogChanged>>", when="tail")
+        except (RuntimeError, tk.TclError):
+            pass  # окно уже закрыто
+
+    @skillperf.timed("check_log_update")
+    def check_log_update(self):
+        if self.job_busy:
+            # Дочитаем, когда закончится текущая задача; изменения за это время сольются в одно
+            self.log_update_pending = True
             return
+        self.log_update_pending = False
+        with self.changed_lock:
+            changed, self.changed_paths = self.changed_paths, set()
+        # Дочитываются только изменившиеся логи, все в одной фоновой задаче
+        log_sets = [ls for ls in self.monitored_log_sets() if any(ls.watches(path) for path in changed)]
+        if not log_sets:
+            return
+        gap = self.session_gap
+
+        def work(progress, cancel):
+            # Ошибка чтения одного лога (файл удалён, нет доступа) не отменяет
+            # события, уже прочитанные из других
+            results = []
+            for log_set in log_sets:
+                try:
+                    chunk, reloaded = log_set.read_new()
+                    if reloaded:
+                        # Лог перечитан заново — индексы нового хранилища строим здесь же
+                        log_set.store.session_index(gap)
+                        log_set.store.skill_totals()
+                        log_set.store.rollups()
+                        log_set.store.rate_tracker(RATE_GAP).update_all()
+                except (OSError, ValueError):
+                    continue
+                results.append((log_set, chunk, reloaded))
+            return results
+
+        self.run_job(work, self.on_log_updates, lambda error: None)
+        self.job_reading = True
+
+    def on_log_updates(self, results):
+        for log_set, chunk, reloaded in results:
+            if log_set is getattr(self, 'log_set', None):
+                self.on_new_events(log_set, chunk, reloaded)
+            elif log_set in self.characters.values():
+                if not reloaded:
+                    # Пустой кусок тоже дописывается: позиция разбора уходит за прочитанные строки
+                    log_set.append(chunk)
+                    if not len(chunk):
+                        continue
+                self.schedule("characters")
+        # После перехода на новый лог месяца следим за ним
+        paths = [log_set.follower.filepath for log_set in self.monitored_log_sets()]
+        if self.log_watcher and self.log_watcher.paths != paths:
+            self.start_log_monitor()
+
+    @skillperf.timed("on_new_events", count=lambda result, self, log_set, chunk, reloaded: len(chunk) if chunk else 0)
+    def on_new_events(self, log_set, chunk, reloaded):
+        # Новые события дописываются в хранилище только в главном потоке
+        if log_set is not self.log_set:
+            return
+        if not reloaded:
+            # Строки без прироста скиллов тоже пройдены: позиция разбора сдвигается
+            log_set.append(chunk)
+            if not len(chunk):
+                return
+            # Итоги по часам дополняются только новыми событиями
+            log_set.store.rollups()
+        self.store = log_set.store
+        # Перерисовываем только графики скиллов, по которым есть новые события
+        self.schedule("data", "filter", "plots", "history", skills=None if reloaded else set(chunk.skills))
 
+    def schedule(self, *what, skills=None):
+        # Отмечает устаревшее: "data" — списки дат и сессий, "filter" — выборка и таблица,
+        # "plots" — графики скиллов skills (None — все), "history" — окно истории,
+        # "characters" — общая таблица персонажей.
+        # Всё отмеченное за UPDATE_DELAY мс
+        # пересчитывается один раз в run_updates.
+        self.dirty.update(what)
+        if "plots" in what:
+            if skills is None or self.dirty_plot_skills is None:
+                self.dirty_plot_skills = None
+            else:
+                self.dirty_plot_skills |= skills
+        if self.update_id is None:
+            self.update_id = self.after(UPDATE_DELAY, self.run_updates)
+
+    @skillperf.timed("run_updates", count=lambda result, self: len(self.filtered_events))
+    def run_updates(self):
+        self.update_id = None
+        dirty, self.dirty = self.dirty, set()
+        plot_skills, self.dirty_plot_skills = self.dirty_plot_skills, set()
+        if "data" in dirty:
+            self.update_dates()
+            self.update_sessions()
+        if "filter" in dirty:
+            self.apply_filters()  # <-- обновляет таблицу!
+        if "plots" in dirty and self.active_plots:
+            self.refresh_active_plot(plot_skills)
+        if "history" in dirty and self.history:
+            self.draw_history()
+        if "characters" in dirty and self.characters_win:
+            self.update_characters_table()
+
+    def update_dates(self):
+        # Добавляет в список новые даты, не сбрасывая выбранную
+        dates = sorted(self.store.session_index(self.session_gap).dates(), reverse=True)
+        if dates != self.dates:
+            self.dates = dates
+            self.date_menu['values'] = [ALL_DATES] + [str(d) for d in self.dates]
+
+    def update_sessions(self):
+        # Обновляет подписи сессий (последняя растёт, могут появиться новые), выбор сохраняется
+        sessions = self.selected_sessions()
+        labels = [self.session_label(s) for s in sessions]
+        if list(self.sessions_combo['values']) != labels:
+            idx = self.sessions_combo.current()
+            self.sessions_combo['values'] = labels
+            if 0 <= idx < len(labels):
+                self.sessions_combo.current(idx)
+
+    @skillperf.timed("apply_filters", count=lambda result, self: len(self.filtered_events))
+    def apply_filters(self):
+        if not len(self.store):
+            return
         # Получаем выбранную сессию
-        sessions = self.get_sessions_for_date(date)
-        idx = self.sessions_combo.current()
-        if not (0 <= idx < len(sessions)):
+        session = self.current_session()
+        if session is None:
             self.filtered_events = []
             self.update_table()
             return
-        session_start, session_end = sessions[idx]
 
         # Фильтрация по времени, если чекбокс включён
         if self.use_time_filter_var.get():
             t_from = self.time_from_var.get()
             t_to = self.time_to_var.get()
             try:
-                t_from_dt = datetime.datetime.strptime(t_from, "%H:%M").time()
-                t_to_dt = datetime.datetime.strptime(t_to, "%H:%M").time()
+                t_from_dt = datetime.datetime.strptime(t_from, "%H:%M")
+                t_to_dt = datetime.datetime.strptime(t_to, "%H:%M")
             except Exception:
                 return
-            self.filtered_events = [
-                e for e in self.events
-                if e['datetime'].date() == date
-                and session_start <= e['datetime'].time() <= session_end
-                and t_from_dt <= e['datetime'].time() <= t_to_dt
-            ]
+            # Время отсчитывается от дня начала сессии. У сессии через полночь время
+            # раньше её начала (с точностью до минуты), попадающее в сессию на следующий
+            # день, — уже следующий день; "до" раньше "от" — тоже.
+            start = self.store.ts[session[0]] // 60 * 60
+            end = self.store.ts[session[-1]]
+            day = start // DAY * DAY
+            t_from_ts = day + t_from_dt.hour * 3600 + t_from_dt.minute * 60
+            t_to_ts = day + t_to_dt.hour * 3600 + t_to_dt.minute * 60
+            if t_from_ts < start and t_from_ts + DAY <= end:
+                t_from_ts += DAY
+            if t_to_ts < start and t_to_ts + DAY <= end:
+                t_to_ts += DAY
+            if t_to_ts < t_from_ts:
+                t_to_ts += DAY
+            self.filtered_events = self.store.select(
+                max(self.store.ts[session[0]], t_from_ts), min(self.store.ts[session[-1]], t_to_ts)
+            )
         else:
             # Без фильтра по времени — вся сессия
-            self.filtered_events = [
-                e for e in self.events
-                if e['datetime'].date() == date
-                and session_start <= e['datetime'].time() <= session_end
-            ]
+            self.filtered_events = session
         self.update_table()
 
+    @skillperf.timed("update_table", count=lambda result, self: len(self.filtered_events))
     def update_table(self):
         # Суммировать приросты по скиллам, взять последнее значение
-        data = {}
-        for e in self.filtered_events:
-            skill = e['skill']
-            if skill not in data:
-                data[skill] = {'increase': 0.0, 'new_value': e['new_value']}
-            data[skill]['increase'] += e['increase']
-            data[skill]['new_value'] = e['new_value']
-        # Очистить таблицу
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        # Сортировать по приросту от большего к меньшему
-        sorted_items = sorted(data.items(), key=lambda x: x[1]['increase'], reverse=True)
-        # Добавить строки
-        for skill, vals in sorted_items:
-            self.tree.insert("", "end", values=(
+        data = self.store.aggregate(self.filtered_events)
+        # ETA — от текущего значения скилла, по скорости последней активной игры
+        eta = {skill: self.skill_eta(skill, RATE_GAP)[1] for skill in data}
+        rows = {
+            skill: (
                 skill,
-                f"{vals['increase']:.6f}".replace('.', ','),
-                f"{vals['new_value']:.6f}".replace('.', ',')
-            ))
+                f"{increase:.6f}".replace('.', ','),
+                f"{new_value:.6f}".replace('.', ','),
+                format_eta(eta[skill])
+            )
+            for skill, (increase, new_value) in data.items()
+        }
+        changed = False
+        # Убрать скиллы, которых больше нет в выборке
+        for skill in [s for s in self.tree_items if s not in rows]:
+            self.tree.delete(self.tree_items.pop(skill))
+            changed = True
+        # Обновить изменившиеся строки и добавить новые
+        for skill, values in rows.items():
+            iid = self.tree_items.get(skill)
+            if iid is None:
+                self.tree_items[skill] = self.tree.insert("", "end", values=values)
+                changed = True
+            elif self.table_values.get(skill) != values:
+                self.tree.item(iid, values=values)
+                changed = True
+        self.table_data = data
+        self.table_eta = eta
+        self.table_values = rows
+        if not changed:
+            return
+        # Сохраняем сортировку, выбранную пользователем
+        self.apply_sort()
         self.autosize_columns()
         # Автоматически менять высоту таблицы (от 10 до 30 строк)
-        row_count = len(self.tree.get_children())
-        tree_height = max(10, min(row_count, 30))
-        self.tree.config(height=tree_height)
-        self.update_idletasks()
+        tree_height = max(10, min(len(rows), 30))
+        if str(self.tree.cget("height")) != str(tree_height):
+            self.tree.config(height=tree_height)
         # --- Удалено управление размером окна ---
-        
+
+    def text_width(self, text):
+        width = self.text_widths.get(text)
+        if width is None:
+            if len(self.text_widths) > 10000:
+                self.text_widths.clear()
+            font = tkfont.nametofont("TkDefaultFont")
+            width = self.text_widths[text] = font.measure(text)
+        return width
+
+    @skillperf.timed("autosize_columns", count=lambda result, self: len(self.table_values))
     def autosize_columns(self):
-        font = tkfont.nametofont("TkDefaultFont")
-        for col in self.tree["columns"]:
-            max_width = font.measure(self.tree.heading(col)["text"])
-            for item in self.tree.get_children():
-                cell_val = str(self.tree.set(item, col))
-                cell_width = font.measure(cell_val)
+        # Шрифтом измеряются только новые тексты, остальные ширины берутся из кэша
+        for i, col in enumerate(self.tree["columns"]):
+            max_width = self.text_width(self.tree.heading(col)["text"])
+            for values in self.table_values.values():
+                cell_width = self.text_width(values[i])
                 if cell_width > max_width:
                     max_width = cell_width
-            self.tree.column(col, width=max_width + 20)
+            if self.column_widths.get(col) != max_width:
+                self.column_widths[col] = max_width
+                self.tree.column(col, width=max_width + 20)
 
     def sort_column(self, col, reverse):
-        l = [(self.tree.set(k, col), k) for k in self.tree.get_children('')]
-        if col in ("increase", "new_value"):
-            l.sort(key=lambda t: float(t[0].replace(',', '.')), reverse=reverse)
-        else:
-            l.sort(reverse=reverse)
-        for index, (val, k) in enumerate(l):
-            self.tree.move(k, '', index)
+        self.sort_state = (col, reverse)
+        self.apply_sort()
         self.tree.heading(col, command=lambda: self.sort_column(col, not reverse))
 
-    def get_sessions_for_date(self, date, gap_minutes=30):
-        events = [e for e in self.events if e['datetime'].date() == date]
-        if not events:
-            return []
-        sessions = []
-        session_start = events[0]['datetime'].time()
-        last_time = events[0]['datetime']
-        for e in events[1:]:
-            delta = (e['datetime'] - last_time).total_seconds() / 60
-            if delta > gap_minutes:
-                sessions.append((session_start, last_time.time()))
-                session_start = e['datetime'].time()
-            last_time = e['datetime']
-        sessions.append((session_start, last_time.time()))
-        return sessions
+    def apply_sort(self):
+        col, reverse = self.sort_state
+        if col == "increase":
+            key = lambda skill: self.table_data[skill][0]
+        elif col == "new_value":
+            key = lambda skill: self.table_data[skill][1]
+        elif col == "eta":
+            key = lambda skill: (self.table_eta[skill] is None, self.table_eta[skill] or 0)
+        else:
+            key = None
+        order = sorted(self.tree_items, key=key, reverse=reverse)
+        if order == self.table_order:
+            return
+        for index, skill in enumerate(order):
+            self.tree.move(self.tree_items[skill], '', index)
+        self.table_order = order
 
-    def on_date_selected(self, event=None):
-        date_str = self.date_var.get()
+    def get_sessions_for_date(self, date, gap_minutes=None):
+        # Сессии — диапазоны индексов событий в self.store; сессия через полночь
+        # попадает в оба дня целиком
+        return self.store.session_index(gap_minutes or self.session_gap).sessions_for(date)
+
+    def selected_date(self):
+        # Дата из списка, None — "Все даты" или ничего не выбрано
         try:
-            date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        except Exception:
-            self.sessions_combo['values'] = []
-            return
-        sessions = self.get_sessions_for_date(date)
-        session_labels = [f"{s[0].strftime('%H:%M')} - {s[1].strftime('%H:%M')}" for s in (sessions)]
-        self.sessions_combo['values'] = session_labels
-        if session_labels:
-            self.sessions_combo.current(0)
-            self.time_from_var.set(sessions[0][0].strftime('%H:%M'))
-            self.time_to_var.set(sessions[0][1].strftime('%H:%M'))
+            return datetime.datetime.strptime(self.date_var.get(), "%Y-%m-%d").date()
+        except ValueError:
+            return None
 
-    def on_session_selected(self, event=None):
-        date_str = self.date_var.get()
+    def selected_sessions(self):
+        if self.date_var.get() == ALL_DATES:
+            return self.store.session_index(self.session_gap).sessions()
+        date = self.selected_date()
+        return self.get_sessions_for_date(date) if date else []
+
+    def session_label(self, session):
+        # Дата показывается, если сессия не из выбранного дня или переходит через полночь
+        start, end = self.session_times(session)
+        start_fmt = '%H:%M' if start.date() == self.selected_date() else '%d.%m.%Y %H:%M'
+        end_fmt = '%H:%M' if end.date() == start.date() else '%d.%m %H:%M'
+        return f"{start.strftime(start_fmt)} - {end.strftime(end_fmt)}"
+
+    def on_gap_changed(self, event=None):
         try:
-            date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        except Exception:
+            gap = int(self.session_gap_var.get())
+        except ValueError:
+            gap = 0
+        if gap <= 0:
+            self.session_gap_var.set(str(self.session_gap))
             return
-        sessions = self.get_sessions_for_date(date)
-        idx = self.sessions_combo.current()
-        if 0 <= idx < len(sessions):
-            self.time_from_var.set(sessions[idx][0].strftime('%H:%M'))
-            self.time_to_var.set(sessions[idx][1].strftime('%H:%M'))
+        if gap == self.session_gap:
+            return
+        self.session_gap = gap
+        self.on_date_selected()
+        self.schedule("filter", "plots")
+
+    def session_times(self, session, store=None):
+        store = store or self.store
+        return to_datetime(store.ts[session[0]]), to_datetime(store.ts[session[-1]])
+
+    def on_date_selected(self, event=None):
+        sessions = self.selected_sessions()
+        self.sessions_combo['values'] = [self.session_label(s) for s in sessions]
+        self.sessions_combo.set("")
+        if sessions:
+            # Для "Все даты" сразу выбирается последняя сессия
+            self.sessions_combo.current(len(sessions) - 1 if self.selected_date() is None else 0)
+            self.on_session_selected()
+
+    def on_session_selected(self, event=None):
+        session = self.current_session()
+        if session is not None:
+            session_start, session_end = self.session_times(session)
+            self.time_from_var.set(session_start.strftime('%H:%M'))
+            self.time_to_var.set(session_end.strftime('%H:%M'))
 
     def on_time_entry(self, event):
         entry = event.widget
@@ -320,28 +706,16 @@ class SkillViewerApp(tk.Tk):
         entry.delete(0, tk.END)
         entry.insert(0, value)
         if len(value) == 5:
-            self.apply_filters()
+            self.schedule("filter")
 
     def show_skill_plot(self):
-        import matplotlib.dates as mdates
-
-        date_str = self.date_var.get()
-        try:
-            date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        except Exception:
+        if self.selected_date() is None and self.date_var.get() != ALL_DATES:
             messagebox.showerror("Ошибка", "Некорректная дата.")
             return
-
-        sessions = self.get_sessions_for_date(date)
-        idx = self.sessions_combo.current()
-        if not (0 <= idx < len(sessions)):
+        session_events = self.current_session()
+        if session_events is None:
             messagebox.showerror("Ошибка", "Сессия не выбрана.")
             return
-        session_start, session_end = sessions[idx]
-        session_events = [
-            e for e in self.events
-            if e['datetime'].date() == date and session_start <= e['datetime'].time() <= session_end
-        ]
 
         plot_win = tk.Toplevel(self)
         plot_win.title("График прироста скилла")
@@ -362,7 +736,7 @@ class SkillViewerApp(tk.Tk):
         control_frame2 = tk.Frame(plot_win)
         control_frame2.pack(fill=tk.X, padx=10, pady=(2, 8))
 
-        session_skills = sorted({e['skill'] for e in session_events})
+        session_skills = self.store.skills_in(session_events)
         skill_var = tk.StringVar(value=session_skills[0] if session_skills else "")
         tk.Label(control_frame1, text="Скилл:").pack(side=tk.LEFT)
         skill_combo = ttk.Combobox(control_frame1, textvariable=skill_var, values=session_skills, state="readonly", width=20)
@@ -376,109 +750,137 @@ class SkillViewerApp(tk.Tk):
         period_entry.pack(side=tk.LEFT, padx=2)
 
         tk.Label(control_frame2, text="Макс. разрыв (мин):").pack(side=tk.LEFT)
-        gap_var = tk.StringVar(value="1")
+        gap_var = tk.StringVar(value=str(RATE_GAP))
         gap_entry = tk.Entry(control_frame2, textvariable=gap_var, width=5)
         gap_entry.pack(side=tk.LEFT, padx=2)
 
+        tk.Label(control_frame2, text="Скорость за (мин):").pack(side=tk.LEFT, padx=(10, 0))
+        window_var = tk.StringVar(value="0")  # 0 — между соседними событиями
+        window_combo = ttk.Combobox(control_frame2, textvariable=window_var, values=["0", "5", "15", "60"], width=4, state="readonly")
+        window_combo.pack(side=tk.LEFT, padx=2)
+
         btn_analyze = tk.Button(control_frame2, text="Построить график")
         btn_analyze.pack(side=tk.LEFT, padx=10)
 
-        def plot_action():
-            skill = skill_var.get()
+        # --- Панель: несколько скиллов на одном графике ---
+        control_frame3 = tk.Frame(plot_win)
+        control_frame3.pack(fill=tk.X, padx=10, pady=(0, 8))
+        tk.Label(control_frame3, text="Скиллы для панели:").pack(side=tk.LEFT, anchor="n")
+        skills_list = tk.Listbox(control_frame3, selectmode=tk.MULTIPLE, height=6, exportselection=False)
+        for skill in session_skills:
+            skills_list.insert(tk.END, skill)
+        skills_list.pack(side=tk.LEFT, padx=2)
+        btn_dashboard = tk.Button(control_frame3, text="Построить панель")
+        btn_dashboard.pack(side=tk.LEFT, padx=10, anchor="n")
+
+        def read_params():
             try:
-                period_min = int(period_var.get())
-                gap_min = int(gap_var.get())
+                return int(period_var.get()), int(gap_var.get()), int(window_var.get())
             except Exception:
                 messagebox.showerror("Ошибка", "Некорректные параметры периода или разрыва.")
-                return
+                return None
 
-            events = [e for e in session_events if e['skill'] == skill]
-            if not events:
-                messagebox.showinfo("Нет данных", "Нет данных по выбранному скиллу.")
-                return
+        def plot_action():
+            params = read_params()
+            if params:
+                self.open_plot(plot_win, session_events, [skill_var.get()], *params)
 
-            events_sorted = sorted(events, key=lambda e: e['datetime'])
-            session = []
-            last_dt = None
-            for e in reversed(events_sorted):
-                if not session:
-                    session.append(e)
-                    last_dt = e['datetime']
-                else:
-                    delta = (last_dt - e['datetime']).total_seconds() / 60
-                    if delta <= gap_min:
-                        session.append(e)
-                        last_dt = e['datetime']
-                    else:
-                        break
-            session = list(reversed(session))
-            if not session:
-                messagebox.showinfo("Нет данных", "Нет подходящей сессии.")
+        def dashboard_action():
+            skills = [skills_list.get(i) for i in skills_list.curselection()]
+            if not skills:
+                messagebox.showinfo("Панель", "Выберите скиллы в списке.")
+                return
+            if len(skills) > MAX_DASHBOARD_SKILLS:
+                messagebox.showinfo("Панель", f"На панели не больше {MAX_DASHBOARD_SKILLS} скиллов.")
                 return
+            params = read_params()
+            if params:
+                self.open_plot(plot_win, session_events, skills, *params)
 
-            end_time = session[-1]['datetime']
-            start_time = end_time - datetime.timedelta(minutes=period_min)
-            period_events = [e for e in session if e['datetime'] >= start_time]
-            if len(period_events) < 2:
+        btn_analyze.config(command=plot_action)
+        btn_dashboard.config(command=dashboard_action)
+
+    def open_plot(self, plot_win, session_events, skills, period_min, gap_min, window_min):
+        # Окно с графиком одного скилла или панелью из нескольких на общих осях.
+        # Такой же график уже открыт — он обновляется и поднимается; открытых окон
+        # не больше MAX_PLOT_WINDOWS, сверх этого новое рисуется в самом старом.
+        series = {}
+        has_events = False
+        for skill in skills:
+            data = self.gain_series(session_events, skill, gap_min, period_min, window_min, self.plot_points())
+            has_events = has_events or len(data[0]) > 0
+            if len(data[0]) >= 2:
+                series[skill] = data
+        if not series:
+            if not has_events:
+                messagebox.showinfo("Нет данных", "Нет данных по выбранному скиллу.")
+            else:
                 messagebox.showinfo("Нет данных", "Недостаточно данных для построения графика.")
+            return
+        params = {
+            "skills": list(series),
+            "period_min": period_min,
+            "gap_min": gap_min,
+            "window_min": window_min,
+        }
+        self.active_plots = [p for p in self.active_plots if p["win"].winfo_exists()]
+        for plot in self.active_plots:
+            if all(plot["params"][key] == value for key, value in params.items()):
+                self.draw_plot(plot, series)
+                plot["win"].deiconify()
+                plot["win"].lift()
                 return
+        if len(self.active_plots) >= MAX_PLOT_WINDOWS:
+            # Фигура и окно самого старого графика используются заново
+            plot = self.active_plots.pop(0)
+            plot["params"].update(params)
+            self.active_plots.append(plot)
+            self.draw_plot(plot, series)
+            plot["win"].lift()
+            return
 
-            # --- Формируем summary для спойлера ---
-            start_val = period_events[0]['new_value']
-            end_val = period_events[-1]['new_value']
-            start_time_str = period_events[0]['datetime'].strftime('%H:%M:%S')
-            end_time_str = period_events[-1]['datetime'].strftime('%H:%M:%S')
-            summary_text = (
-                f"{start_time_str} - Скилл в начале: {start_val:.4f}\n"
-                f"{end_time_str} - Скилл в конце : {end_val:.4f}"
-            )
+        # --- Окно графика ---
+        graph_win = tk.Toplevel(self)
+        if self.always_on_top_var.get():
+            graph_win.attributes('-topmost', True)
 
-            # --- Окно графика ---
-            graph_win = tk.Toplevel(self)
-            graph_win.title(f"График прироста {skill}")
-            if self.always_on_top_var.get():
-                graph_win.attributes('-topmost', True)
-
-            # --- Спойлер (collapsible frame) ---
-            spoiler_frame = ttk.Frame(graph_win)
-            spoiler_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
-            summary_label = tk.Label(spoiler_frame, text=summary_text, justify="left", font=("Consolas", 11))
-            def toggle_summary():
-                if summary_label.winfo_ismapped():
-                    summary_label.pack_forget()
-                    btn_spoiler.config(text="Показать детали")
-                else:
-                    summary_label.pack(fill=tk.X, padx=10, pady=5)
-                    btn_spoiler.config(text="Скрыть детали")
-            btn_spoiler = ttk.Button(spoiler_frame, text="Показать детали", command=toggle_summary)
-            btn_spoiler.pack(anchor="w")
-            # По умолчанию свернуто, не pack'аем summary_label
-
-            # --- График ---
-            times = [e['datetime'] for e in period_events]
-            values = [e['new_value'] for e in period_events]
-            gain_per_hour = []
-            time_labels = []
-            for i in range(1, len(times)):
-                delta_skill = values[i] - values[i-1]
-                delta_time = (times[i] - times[i-1]).total_seconds() / 3600
-                if delta_time > 0:
-                    gain_per_hour.append(delta_skill / delta_time)
-                    time_labels.append(times[i])
-
-            fig, ax = plt.subplots(figsize=(7, 4))
-            ax.plot(time_labels, gain_per_hour, marker='o')
-            ax.set_title(f"{skill}: прирост за час")
-            ax.set_xlabel("Время")
-            ax.set_ylabel("Gain per hour")
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-            fig.autofmt_xdate()
+        # --- Спойлер (collapsible frame) ---
+        spoiler_frame = ttk.Frame(graph_win)
+        spoiler_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        summary_label = tk.Label(spoiler_frame, justify="left", font=("Consolas", 11))
+        def toggle_summary():
+            if summary_label.winfo_ismapped():
+                summary_label.pack_forget()
+                btn_spoiler.config(text="Показать детали")
+            else:
+                summary_label.pack(fill=tk.X, padx=10, pady=5)
+                btn_spoiler.config(text="Скрыть детали")
+        btn_spoiler = ttk.Button(spoiler_frame, text="Показать детали", command=toggle_summary)
+        btn_spoiler.pack(anchor="w")
+        # По умолчанию свернуто, не pack'аем summary_label
+
+        # --- График ---
+        # Figure без pyplot: фигура принадлежит окну и освобождается в close_plot
+        mpl = plotting()
+        fig = mpl.Figure(figsize=PLOT_SIZE, dpi=PLOT_DPI)
+        canvas = mpl.FigureCanvasTkAgg(fig, master=graph_win)
+        # draw_idle вызывает canvas.draw — так замеряется сама отрисовка
+        canvas.draw = skillperf.timed("plot_draw")(canvas.draw)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-            canvas = FigureCanvasTkAgg(fig, master=graph_win)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        plot = {"win": graph_win, "params": params}
+        params.update({
+            "plot_win": plot_win,
+            "fig": fig,
+            "canvas": canvas,
+            "summary_label": summary_label
+        })
+        self.active_plots.append(plot)
+        self.draw_plot(plot, series)
+        graph_win.protocol("WM_DELETE_WINDOW", lambda: self.close_plot(plot))
 
-            # --- Позиционирование graph_win ---
+        # --- Позиционирование graph_win ---
+        if plot_win.winfo_exists():
             plot_win.update_idletasks()
             graph_win.update_idletasks()
             plot_x = plot_win.winfo_rootx()
@@ -488,123 +890,420 @@ class SkillViewerApp(tk.Tk):
             new_y = plot_y + plot_h + 5
             graph_win.geometry(f"+{new_x}+{new_y}")
 
-            # --- Сохраняем параметры для автообновления ---
-            self.active_plots.append({
-                "win": graph_win,
-                "params": {
-                    "skill": skill,
-                    "period_min": period_min,
-                    "gap_min": gap_min,
-                    "plot_win": plot_win,
-                    "fig": fig,
-                    "ax": ax,
-                    "canvas": canvas,
-                    "summary_label": summary_label
-                }
-            })
-            def on_close():
-                self.active_plots = [p for p in self.active_plots if p["win"] != graph_win]
-                graph_win.destroy()
-            graph_win.protocol("WM_DELETE_WINDOW", on_close)
-            
-        btn_analyze.config(command=plot_action)
+    def draw_plot(self, plot, series):
+        # Заново строит оси в фигуре окна: линия на скилл, общие оси времени и скорости
+        params = plot["params"]
+        fig = params["fig"]
+        mpl = plotting()
+        fig.clear()
+        ax = fig.subplots()
+        lines = {}
+        for skill, (ts, values, time_labels, gain_per_hour) in series.items():
+            lines[skill], = ax.plot(time_labels, gain_per_hour, marker='o' if len(series) == 1 else None, label=skill)
+        if len(series) == 1:
+            skill = next(iter(series))
+            ax.set_title(f"{skill}: прирост за час")
+            plot["win"].title(f"График прироста {skill}")
+        else:
+            ax.set_title("Прирост за час")
+            ax.legend(loc="upper left", fontsize="small")
+            plot["win"].title(f"Панель: {', '.join(series)}")
+        ax.set_xlabel("Время")
+        ax.set_ylabel("Gain per hour")
+        ax.xaxis.set_major_formatter(mpl.mdates.DateFormatter('%H:%M:%S'))
+        fig.autofmt_xdate()
+        params["ax"] = ax
+        params["lines"] = lines
+        params["summary_label"].config(text=self.plot_summary(series, params["gap_min"]))
+        params["canvas"].draw_idle()
+
+    def plot_summary(self, series, gap_min):
+        # Значения скилла в начале и в конце периода и ETA, для панели — по строке на скилл
+        if len(series) == 1:
+            skill, (ts, values, _, _) = next(iter(series.items()))
+            start_time_str = to_datetime(int(ts[0])).strftime('%H:%M:%S')
+            end_time_str = to_datetime(int(ts[-1])).strftime('%H:%M:%S')
+            rate, eta, target = self.skill_eta(skill, gap_min)
+            return (
+                f"{start_time_str} - Скилл в начале: {values[0]:.4f}\n"
+                f"{end_time_str} - Скилл в конце : {values[-1]:.4f}\n"
+                f"Скорость: {format_rate(rate)}, до {target:g}: {format_eta(eta)}"
+            )
+        width = max(len(skill) for skill in series)
+        lines = []
+        for skill, (ts, values, _, _) in series.items():
+            rate, eta, target = self.skill_eta(skill, gap_min)
+            lines.append(
+                f"{skill:<{width}}  {to_datetime(int(ts[0])).strftime('%H:%M:%S')} {values[0]:.4f}"
+                f" -> {to_datetime(int(ts[-1])).strftime('%H:%M:%S')} {values[-1]:.4f}"
+                f"  {format_rate(rate)}, до {target:g}: {format_eta(eta)}"
+            )
+        return "\n".join(lines)
+
+    def target_value(self):
+        # Цель из поля "Цель"; None — не задана
+        try:
+            return float(self.target_var.get().replace(',', '.'))
+        except ValueError:
+            return None
+
+    def skill_eta(self, skill, gap_min):
+        # (прирост за час, часов активной игры до цели, цель) по потоковой оценке скилла
+        state = self.store.rate_tracker(gap_min).skill(skill)
+        if state is None:
+            return None, None, None
+        target = next_target(state.last_value, self.target_value())
+        return state.rate(), state.eta(target), target
 
-    def refresh_active_plot(self):
+    def close_plot(self, plot):
+        # Окно закрыто: фигура очищается, виджет холста уничтожается, ссылки отпускаются
+        if plot in self.active_plots:
+            self.active_plots.remove(plot)
+        params = plot["params"]
+        params["fig"].clear()
+        # Отложенная draw_idle перерисовка уже закрытого окна ничего не делает
+        params["canvas"].draw = lambda: None
+        params["canvas"].get_tk_widget().destroy()
+        plot["win"].destroy()
+        params.clear()
 
+    def plot_points(self, canvas=None):
+        # Точек в ряду — по ширине холста в пикселях; без холста — по ширине новой фигуры
+        width = canvas.get_tk_widget().winfo_width() if canvas else PLOT_SIZE[0] * PLOT_DPI
+        return max(MIN_PLOT_POINTS, width)
+
+    def gain_series(self, session_events, skill, gap_min, period_min, window_min=0, max_points=MAX_PLOT_POINTS):
+        # Время и значения событий периода, точки графика прироста за час
+        # (между соседними событиями или скользящим окном window_min минут)
+        skillrates = plotting().skillrates
+        ts, values = skillrates.skill_series(self.store, session_events, skill)
+        ts, values = skillrates.period_slice(ts, values, gap_min, period_min)
+        times, rates = skillrates.gain_rates(ts, values, window_min)
+        times, rates = skillrates.downsample(times, rates, max_points)
+        return ts, values, times.astype('datetime64[s]'), rates
+
+    def current_session(self):
+        sessions = self.selected_sessions()
+        idx = self.sessions_combo.current()
+        if not (0 <= idx < len(sessions)):
+            return None
+        return sessions[idx]
+
+    @skillperf.timed("refresh_active_plot", count=lambda result, self, skills=None: len(self.active_plots))
+    def refresh_active_plot(self, skills=None):
+        # Обновляются только графики скиллов из skills (None — все).
+        # Графики с одинаковыми параметрами берут один посчитанный ряд,
+        # фигура панели перерисовывается один раз за все свои скиллы.
+        # Пересобираем session_events из self.store (на случай новых данных)
+        session_events = self.current_session()
+        if session_events is None:
+            return
+        memo = {}
         for plot in self.active_plots[:]:
-            graph_win = plot["win"]
-            if not graph_win.winfo_exists():
+            if not plot["win"].winfo_exists():
                 self.active_plots.remove(plot)
                 continue
             params = plot["params"]
-            skill = params["skill"]
-            period_min = params["period_min"]
-            gap_min = params["gap_min"]
-            ax = params["ax"]
-            canvas = params["canvas"]
-            summary_label = params["summary_label"]
-
-            # Пересобираем session_events из self.events (на случай новых данных)
-            date_str = self.date_var.get()
-            try:
-                date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-            except Exception:
+            if skills is not None and not skills.intersection(params["skills"]):
                 continue
-            sessions = self.get_sessions_for_date(date)
-            idx = self.sessions_combo.current()
-            if not (0 <= idx < len(sessions)):
-                continue
-            session_start, session_end = sessions[idx]
-            session_events = [
-                e for e in self.events
-                if e['datetime'].date() == date and session_start <= e['datetime'].time() <= session_end
-            ]
-            events = [e for e in session_events if e['skill'] == skill]
-            if not events:
+            series = {}
+            for skill in params["skills"]:
+                key = (skill, params["gap_min"], params["period_min"], params["window_min"],
+                       self.plot_points(params["canvas"]))
+                if key not in memo:
+                    memo[key] = self.gain_series(session_events, *key)
+                if len(memo[key][0]) >= 2:
+                    series[skill] = memo[key]
+            if not series:
                 continue
 
-            events_sorted = sorted(events, key=lambda e: e['datetime'])
-            session = []
-            last_dt = None
-            for e in reversed(events_sorted):
-                if not session:
-                    session.append(e)
-                    last_dt = e['datetime']
-                else:
-                    delta = (last_dt - e['datetime']).total_seconds() / 60
-                    if delta <= gap_min:
-                        session.append(e)
-                        last_dt = e['datetime']
-                    else:
-                        break
-            session = list(reversed(session))
-            if not session:
-                continue
+            # --- Обновляем только данные линий, перерисовка — когда Tk освободится ---
+            ax = params["ax"]
+            for skill, (ts, values, time_labels, gain_per_hour) in series.items():
+                params["lines"][skill].set_data(time_labels, gain_per_hour)
+            ax.relim()
+            ax.autoscale_view()
+            params["canvas"].draw_idle()
+            params["summary_label"].config(text=self.plot_summary(series, params["gap_min"]))
+
+    # --- Персонажи ---
+    def show_characters(self):
+        # Общая таблица: прирост за последнюю сессию у каждого персонажа, по скиллам
+        if self.characters_win:
+            self.characters_win["win"].deiconify()
+            self.characters_win["win"].lift()
+            return
+        win = tk.Toplevel(self)
+        win.title("Персонажи")
+        if self.always_on_top_var.get():
+            win.attributes('-topmost', True)
+        buttons = tk.Frame(win)
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        tk.Button(buttons, text="Добавить папку персонажа", command=self.add_character).pack(side=tk.LEFT)
+        columns = ("increase", "new_value", "session")
+        tree = ttk.Treeview(win, columns=columns, show="tree headings", height=15)
+        tree.heading("#0", text="Персонаж / скилл")
+        tree.heading("increase", text="Прирост")
+        tree.heading("new_value", text="Итоговое значение")
+        tree.heading("session", text="Сессия")
+        tree.column("#0", width=220)
+        tree.column("increase", width=100, anchor="e")
+        tree.column("new_value", width=120, anchor="e")
+        tree.column("session", width=130)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        tk.Button(buttons, text="Убрать выбранного", command=lambda: self.remove_character(tree)).pack(side=tk.LEFT, padx=5)
+        self.characters_win = {"win": win, "tree": tree, "items": {}}
+        win.protocol("WM_DELETE_WINDOW", self.close_characters)
+        self.update_characters_table()
+
+    def add_character(self):
+        folder = filedialog.askdirectory(title="Выберите папку с логами персонажа",
+                                         parent=self.characters_win["win"] if self.characters_win else self)
+        if not folder:
+            return
+        paths = discover_skill_logs(folder)
+        if not paths:
+            messagebox.showwarning("Внимание", "В папке не найдено логов скиллов (_Skills*.txt).")
+            return
+        self.load_character(paths)
+
+    def load_character(self, paths):
+        name = character_name(paths)
+        if name in self.characters or self.log_set_names().get(name):
+            messagebox.showinfo("Персонажи", f"За персонажем {name} уже следим.")
+            return
+        if self.job_busy:
+            # Загрузка начнётся после текущей задачи
+            self.after(200, self.load_character, paths)
+            return
+        log_set = LogSet(paths, self.parse_cache)
+        gap = self.session_gap
+
+        def work(progress, cancel):
+            store = log_set.load(progress, cancel)
+            store.session_index(gap)
+            store.skill_totals()
+            return store
+
+        def done(store):
+            self.show_progress(None)
+            if not len(store):
+                messagebox.showwarning("Внимание", f"В логах {name} не найдено событий.")
+                return
+            self.characters[name] = log_set
+            self.start_log_monitor()
+            self.schedule("characters")
 
-            end_time = session[-1]['datetime']
-            start_time = end_time - datetime.timedelta(minutes=period_min)
-            period_events = [e for e in session if e['datetime'] >= start_time]
-            if len(period_events) < 2:
+        self.show_progress(f"Загрузка {name}...")
+        self.run_job(work, done, self.on_load_error)
+
+    def remove_character(self, tree):
+        iid = tree.focus()
+        while iid and tree.parent(iid):
+            iid = tree.parent(iid)
+        name = tree.item(iid, "text") if iid else None
+        if name not in self.characters:
+            return
+        self.characters.pop(name).save()
+        self.start_log_monitor()
+        self.schedule("characters")
+
+    def log_set_names(self):
+        # Имя -> LogSet для всех, за кем следим, основной лог первым
+        names = {}
+        if getattr(self, 'log_set', None):
+            names[character_name(self.log_set.paths)] = self.log_set
+        names.update(self.characters)
+        return names
+
+    @skillperf.timed("update_characters_table")
+    def update_characters_table(self):
+        tree = self.characters_win["tree"]
+        items = self.characters_win["items"]
+        closed = {name for name, iid in items.items() if not tree.item(iid, "open")}
+        tree.delete(*tree.get_children())
+        items.clear()
+        for name, log_set in self.log_set_names().items():
+            store = log_set.store
+            sessions = store.session_index(self.session_gap).sessions()
+            if not sessions:
                 continue
+            session = sessions[-1]
+            data = store.aggregate(session)
+            start, end = self.session_times(session, store)
+            total = sum(increase for increase, _ in data.values())
+            iid = items[name] = tree.insert("", "end", text=name, open=name not in closed, values=(
+                f"{total:.6f}".replace('.', ','), "",
+                f"{start.strftime('%d.%m %H:%M')} - {end.strftime('%H:%M' if end.date() == start.date() else '%d.%m %H:%M')}"
+            ))
+            for skill, (increase, new_value) in sorted(data.items(), key=lambda x: x[1][0], reverse=True):
+                tree.insert(iid, "end", text=skill, values=(
+                    f"{increase:.6f}".replace('.', ','), f"{new_value:.6f}".replace('.', ','), ""
+                ))
 
-            times = [e['datetime'] for e in period_events]
-            values = [e['new_value'] for e in period_events]
-            gain_per_hour = []
-            time_labels = []
-            for i in range(1, len(times)):
-                delta_skill = values[i] - values[i-1]
-                delta_time = (times[i] - times[i-1]).total_seconds() / 3600
-                if delta_time > 0:
-                    gain_per_hour.append(delta_skill / delta_time)
-                    time_labels.append(times[i])
-
-            # --- Обновляем только содержимое графика ---
-            ax.clear()
-            ax.plot(time_labels, gain_per_hour, marker='o')
-            ax.set_title(f"{skill}: прирост за час")
-            ax.set_xlabel("Время")
-            ax.set_ylabel("Gain per hour")
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-            ax.figure.autofmt_xdate()
-            canvas.draw()
-
-            start_val = period_events[0]['new_value']
-            end_val = period_events[-1]['new_value']
-            start_time_str = period_events[0]['datetime'].strftime('%H:%M:%S')
-            end_time_str = period_events[-1]['datetime'].strftime('%H:%M:%S')
-            summary_text = (
-                f"Период: {start_time_str} - Скилл в начале: {start_val:.4f}\n"
-                f"        {end_time_str}  - Скилл в конце: {end_val:.4f}"
-            )
-            summary_label.config(text=summary_text)
+    def close_characters(self):
+        # Окно закрывается, слежение за персонажами продолжается
+        win, self.characters_win = self.characters_win["win"], None
+        win.destroy()
+
+    # --- История по часам и дням ---
+    def show_history(self):
+        # Одно окно: карта активности (дни на часы) или прирост скилла по дням.
+        # Рисуется из итогов по часам, поэтому не зависит от длины загруженного лога.
+        if not len(self.store):
+            messagebox.showinfo("История", "Сначала откройте лог.")
+            return
+        if self.history:
+            self.history["win"].deiconify()
+            self.history["win"].lift()
+            self.draw_history()
+            return
+        win = tk.Toplevel(self)
+        win.title("История")
+        if self.always_on_top_var.get():
+            win.attributes('-topmost', True)
+        controls = tk.Frame(win)
+        controls.pack(fill=tk.X, padx=10, pady=(8, 2))
+        view_var = tk.StringVar(value=next(iter(HISTORY_VIEWS)))
+        skill_var = tk.StringVar(value=ALL_SKILLS)
+        metric_var = tk.StringVar(value=next(iter(HISTORY_METRICS)))
+        days_var = tk.StringVar(value="30")
+        combos = []
+        for label, var, values, width in (
+            ("Вид:", view_var, list(HISTORY_VIEWS), 16),
+            ("Скилл:", skill_var, [ALL_SKILLS] + sorted(self.store.skills), 20),
+            ("Показатель:", metric_var, list(HISTORY_METRICS), 14),
+            ("Дней:", days_var, HISTORY_DAYS, 5),
+        ):
+            tk.Label(controls, text=label).pack(side=tk.LEFT, padx=(6, 0))
+            combo = ttk.Combobox(controls, textvariable=var, values=values, state="readonly", width=width)
+            combo.pack(side=tk.LEFT, padx=2)
+            combo.bind("<<ComboboxSelected>>", lambda e: self.draw_history())
+            combos.append(combo)
+
+        mpl = plotting()
+        fig = mpl.Figure(figsize=(8, 5))
+        canvas = mpl.FigureCanvasTkAgg(fig, master=win)
+        canvas.draw = skillperf.timed("history_draw")(canvas.draw)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.history = {
+            "win": win, "fig": fig, "canvas": canvas, "skill_combo": combos[1],
+            "view_var": view_var, "skill_var": skill_var, "metric_var": metric_var, "days_var": days_var,
+        }
+        win.protocol("WM_DELETE_WINDOW", self.close_history)
+        self.draw_history()
+
+    @skillperf.timed("draw_history")
+    def draw_history(self):
+        history = self.history
+        mpl = plotting()
+        rollups = self.store.rollups()
+        skill = history["skill_var"].get()
+        skill = None if skill == ALL_SKILLS else skill
+        metric_name = history["metric_var"].get()
+        metric = HISTORY_METRICS[metric_name]
+        days = int(history["days_var"].get())
+        last_day = self.store.ts[-1] // DAY
+        first_day = last_day - days + 1
+        skills = [ALL_SKILLS] + sorted(self.store.skills)
+        if list(history["skill_combo"]["values"]) != skills:
+            history["skill_combo"]["values"] = skills
+        title = f"{skill or ALL_SKILLS}: {metric_name.lower()}"
+        fig = history["fig"]
+        fig.clear()
+        ax = fig.subplots()
+        if HISTORY_VIEWS[history["view_var"].get()] == "heatmap":
+            matrix = mpl.skillrates.hour_matrix(rollups, first_day, days, skill, metric)
+            image = ax.imshow(matrix, aspect="auto", cmap="viridis", interpolation="nearest",
+                              extent=(0, 24, days - 0.5, -0.5))
+            fig.colorbar(image, ax=ax)
+            step = max(1, days // 15)
+            ax.set_yticks(range(0, days, step))
+            ax.set_yticklabels([to_datetime((first_day + d) * DAY).strftime('%d.%m.%y') for d in range(0, days, step)])
+            ax.set_xticks(range(0, 25, 3))
+            ax.set_xlabel("Час")
+            ax.set_title(f"{title} по часам")
+        else:
+            values = mpl.skillrates.day_values(rollups, first_day, days, skill, metric)
+            dates = [to_datetime((first_day + d) * DAY) for d in range(days)]
+            ax.bar(dates, values, width=0.8)
+            ax.xaxis.set_major_formatter(mpl.mdates.DateFormatter('%d.%m'))
+            fig.autofmt_xdate()
+            ax.set_title(f"{title} по дням")
+        history["canvas"].draw_idle()
+
+    def close_history(self):
+        history, self.history = self.history, None
+        history["fig"].clear()
+        history["canvas"].draw = lambda: None
+        history["canvas"].get_tk_widget().destroy()
+        history["win"].destroy()
+
+    # --- Окно замеров ---
+    def toggle_perf_window(self):
+        if self.perf_win is not None and self.perf_win.winfo_exists():
+            self.perf_win.destroy()
+            self.perf_win = None
+            return
+        win = self.perf_win = tk.Toplevel(self)
+        win.title("Замеры производительности")
+        if self.always_on_top_var.get():
+            win.attributes('-topmost', True)
+        top = tk.Frame(win)
+        top.pack(fill=tk.X, padx=5, pady=5)
+        enabled_var = tk.BooleanVar(value=skillperf.enabled)
+        tk.Checkbutton(top, text="Включить замеры", variable=enabled_var,
+                       command=lambda: skillperf.enable(enabled_var.get())).pack(side=tk.LEFT)
+        tk.Button(top, text="Сбросить", command=skillperf.reset).pack(side=tk.RIGHT)
+        tk.Button(top, text="Сохранить в файл", command=self.save_perf_dump).pack(side=tk.RIGHT, padx=5)
+        columns = ("name", "calls", "last_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms", "events")
+        titles = ("Этап", "Вызовов", "Послед., мс", "p50, мс", "p90, мс", "p99, мс", "Макс., мс", "Событий")
+        tree = ttk.Treeview(win, columns=columns, show="headings", height=10)
+        for col, title in zip(columns, titles):
+            tree.heading(col, text=title)
+            tree.column(col, width=140 if col == "name" else 80, anchor="w" if col == "name" else "e")
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        self.refresh_perf_window(win, tree)
+
+    def refresh_perf_window(self, win, tree):
+        # Пока окно открыто, сводка обновляется раз в секунду
+        if win is not self.perf_win or not win.winfo_exists():
+            return
+        tree.delete(*tree.get_children())
+        for name, row in skillperf.stats().items():
+            tree.insert("", "end", values=(
+                name, row['calls'],
+                *(f"{row[key]:.2f}" for key in ("last_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms")),
+                f"{row['events']:.0f}"
+            ))
+        self.after(1000, self.refresh_perf_window, win, tree)
+
+    def save_perf_dump(self):
+        path = filedialog.asksaveasfilename(
+            parent=self.perf_win, title="Сохранить замеры", defaultextension=".json",
+            initialfile="skillviewer_perf.json", filetypes=[("JSON", "*.json"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            skillperf.dump(path)
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить замеры:\n{e}", parent=self.perf_win)
 
     def update_always_on_top(self):
         self.attributes('-topmost', self.always_on_top_var.get())
 
     def on_close(self):
+        if self.log_watcher:
+            self.log_watcher.stop()
+        for log_set in self.monitored_log_sets():
+            log_set.save()
         self.destroy()
         self.quit()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # для процессов разбора в собранном exe
     app = SkillViewerApp()
+    if STARTUP_PROBE:
+        app.after_idle(app.on_close)
     app.mainloop()
\ No newline at end of file
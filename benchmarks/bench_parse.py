@@ -0,0 +1,114 @@
+# Сравнение быстрого парсера с прежним (regex + strptime) на синтетическом логе.
+# Перед замером — проверка перехода через полночь при дочитывании лога
+# (прежний парсер относит такие события к предыдущему дню).
+# Запуск: python benchmarks/bench_parse.py [число строк]
+import datetime
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from loggen import LINES, write_log  # noqa: E402
+from skilllog import LogFollower, parse_log_file  # noqa: E402
+from skillstore import to_datetime  # noqa: E402
+
+TARGET_SPEEDUP = 3.5
+
+
+def legacy_parse(filepath):
+    # Прежняя реализация parse_log_file
+    with open(filepath, encoding='cp1251') as f:
+        content = f.readlines()
+    date_start = None
+    events = []
+    date_re = re.compile(r'^Logging started (\d{4}-\d{2}-\d{2})')
+    event_re = re.compile(r'^\[(\d{2}):(\d{2}):(\d{2})\] (.+?) increased by ([\d,]+) to ([\d,]+)')
+    for line in content:
+        line = line.strip()
+        m = date_re.match(line)
+        if m:
+            date_start = m.group(1)
+            continue
+        m = event_re.match(line)
+        if m and date_start:
+            h, mi, s = map(int, m.groups()[:3])
+            dt = datetime.datetime.strptime(f"{date_start} {h:02d}:{mi:02d}:{s:02d}", "%Y-%m-%d %H:%M:%S")
+            events.append({
+                'datetime': dt,
+                'skill': m.group(4),
+                'increase': float(m.group(5).replace(',', '.')),
+                'new_value': float(m.group(6).replace(',', '.'))
+            })
+    return events
+
+
+def check_rollover(tmp):
+    # [23:59:50] -> [00:00:10] попадает в следующий день, откат на секунды не
+    # уводит время назад; недописанная строка ждёт перевода строки;
+    # обрезанный файл перечитывается заново
+    path = os.path.join(tmp, '_Skills.rollover.txt')
+
+    def write(text, mode='ab'):
+        with open(path, mode) as f:
+            f.write(text.encode('cp1251'))
+
+    def dates(store):
+        return [to_datetime(ts) for ts in store.ts]
+
+    errors = []
+    write("Logging started 2024-01-31\r\n[23:59:50] Mining increased by 0,1 to 10,1\r\n", 'wb')
+    follower = LogFollower(path)
+    follower.load()
+    write("[00:00:10] Mining increased by 0,1 to 10,2")
+    if follower.poll() != (0, False):
+        errors.append("недописанная строка разобрана раньше перевода строки")
+    write("\r\n")
+    if follower.poll() != (1, False):
+        errors.append("дописанная строка не разобрана")
+    if dates(follower.store) != [datetime.datetime(2024, 1, 31, 23, 59, 50), datetime.datetime(2024, 2, 1, 0, 0, 10)]:
+        errors.append(f"переход через полночь: {dates(follower.store)}")
+    # Небольшой откат часов не должен нарушать порядок времени событий
+    write("[00:00:05] Mining increased by 0,1 to 10,25\r\n")
+    follower.poll()
+    if list(follower.store.ts) != sorted(follower.store.ts):
+        errors.append(f"время событий идёт назад: {dates(follower.store)}")
+    write("Logging started 2024-02-02\r\n[00:00:05] Mining increased by 0,1 to 10,3\r\n", 'wb')
+    count, reloaded = follower.poll()
+    if not reloaded or dates(follower.store) != [datetime.datetime(2024, 2, 2, 0, 0, 5)]:
+        errors.append(f"обрезанный файл не перечитан: {dates(follower.store)}")
+    for error in errors:
+        print(f"Ошибка дочитывания: {error}")
+    return not errors
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else LINES
+    with tempfile.TemporaryDirectory() as tmp:
+        if not check_rollover(tmp):
+            return 1
+        path = os.path.join(tmp, '_Skills.txt')
+        write_log(path, lines)
+        legacy_time, events = timed(legacy_parse, path)
+        fast_time, store = timed(parse_log_file, path)
+    if len(events) != len(store):
+        print(f"Разное число событий: {len(events)} и {len(store)}")
+        return 1
+    speedup = legacy_time / fast_time
+    print(f"{lines} строк: прежний парсер {legacy_time:.2f} с, новый {fast_time:.2f} с, ускорение x{speedup:.1f}")
+    if speedup < TARGET_SPEEDUP:
+        print(f"Ускорение меньше целевого x{TARGET_SPEEDUP}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+# Замер горячих путей на синтетических логах разного размера:
+# разбор файла, сессии по датам, фильтр сессии, обновление таблицы, ряды графика,
+# итоги по часам и окно истории из них.
+# Для каждого этапа — лучшее время из нескольких повторов и пик памяти (tracemalloc).
+# Запуск:
+#   python benchmarks/bench_suite.py --output base.json
+#   python benchmarks/bench_suite.py --compare base.json   — код возврата 1 при регрессии
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from loggen import write_log  # noqa: E402
+from skilllog import parse_log_file, read_latest  # noqa: E402
+from skillstore import DAY, Rollups  # noqa: E402
+import skillrates  # noqa: E402
+from SkillViewer import SkillViewerApp  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+REPEAT = 3
+# Замедление больше чем в TOLERANCE раз считается регрессией;
+# этапы быстрее MIN_TIME секунд не сравниваются — там один шум
+TOLERANCE = 1.25
+MIN_TIME = 0.005
+STAGES = ['parse', 'latest', 'sessions', 'filter', 'table', 'plot', 'rollups', 'history']
+
+
+class Var:
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class Combo:
+    def __init__(self):
+        self.index = -1
+
+    def current(self):
+        return self.index
+
+
+class NullTree:
+    # Treeview без экрана: строки только считаются
+    def __init__(self):
+        self.count = 0
+
+    def __getitem__(self, key):
+        return ("skill", "increase", "new_value", "eta")
+
+    def insert(self, parent, index, values):
+        self.count += 1
+        return f"I{self.count}"
+
+    def delete(self, iid):
+        pass
+
+    def item(self, iid, values):
+        pass
+
+    def move(self, iid, parent, index):
+        pass
+
+    def heading(self, col, **kw):
+        return {"text": col}
+
+    def column(self, col, **kw):
+        pass
+
+    def cget(self, key):
+        return 10
+
+    def config(self, **kw):
+        pass
+
+
+class HeadlessView:
+    # Методы окна SkillViewerApp на заглушках виджетов, без Tk
+    apply_filters = SkillViewerApp.apply_filters
+    update_table = SkillViewerApp.update_table
+    apply_sort = SkillViewerApp.apply_sort
+    autosize_columns = SkillViewerApp.autosize_columns
+    get_sessions_for_date = SkillViewerApp.get_sessions_for_date
+    selected_date = SkillViewerApp.selected_date
+    selected_sessions = SkillViewerApp.selected_sessions
+    current_session = SkillViewerApp.current_session
+    gain_series = SkillViewerApp.gain_series
+    skill_eta = SkillViewerApp.skill_eta
+    target_value = SkillViewerApp.target_value
+
+    def __init__(self, store):
+        self.store = store
+        self.session_gap = 30
+        self.filtered_events = []
+        self.date_var = Var()
+        self.sessions_combo = Combo()
+        self.use_time_filter_var = Var(True)
+        self.time_from_var = Var("00:00")
+        self.time_to_var = Var("23:59")
+        self.target_var = Var("")
+        self.tree = NullTree()
+        self.tree_items = {}
+        self.table_data = {}
+        self.table_values = {}
+        self.table_order = []
+        self.table_eta = {}
+        self.sort_state = ("increase", True)
+        self.column_widths = {}
+
+    def text_width(self, text):
+        # Вместо измерения шрифтом
+        return 7 * len(text)
+
+    def all_sessions(self):
+        return [(date, i, session)
+                for date in self.store.session_index().dates()
+                for i, session in enumerate(self.get_sessions_for_date(date))]
+
+
+def stage_parse(path, store):
+    parse_log_file(path)
+
+
+def stage_latest(path, store):
+    # Последние 15 минут лога для живого графика
+    read_latest(path, 15)
+
+
+def stage_sessions(path, store):
+    # Индекс сессий строится заново, как после открытия лога
+    store.session_indexes = {}
+    view = HeadlessView(store)
+    for date in store.session_index().dates():
+        view.get_sessions_for_date(date)
+
+
+def stage_filter(path, store):
+    # Выбор каждой сессии в списке с фильтром по времени (вместе с таблицей)
+    view = HeadlessView(store)
+    for date, i, session in view.all_sessions():
+        view.date_var.set(str(date))
+        view.sessions_combo.index = i
+        view.apply_filters()
+
+
+def stage_table(path, store):
+    view = HeadlessView(store)
+    for date, i, session in view.all_sessions():
+        view.filtered_events = session
+        view.update_table()
+
+
+def stage_plot(path, store):
+    # Ряды прироста за час: по всем скиллам, весь лог на одном графике
+    view = HeadlessView(store)
+    events = range(len(store))
+    for skill in store.skills:
+        view.gain_series(events, skill, 10 ** 6, 10 ** 6, 15)
+
+
+def stage_rollups(path, store):
+    # Итоги по часам с нуля, как при первом открытии лога без кэша
+    Rollups(store).extend()
+
+
+def stage_history(path, store):
+    # Окно истории за год: карта по часам и прирост по дням каждого скилла
+    rollups = store.rollups()
+    first_day = store.ts[-1] // DAY - 364
+    skillrates.hour_matrix(rollups, first_day, 365)
+    for skill in store.skills:
+        skillrates.day_values(rollups, first_day, 365, skill)
+
+
+def best_time(stage, path, store, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage(path, store)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def peak_memory(stage, path, store):
+    tracemalloc.start()
+    try:
+        stage(path, store)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for lines in sizes:
+            path = os.path.join(tmp, f'_Skills.{lines}.txt')
+            write_log(path, lines)
+            store = parse_log_file(path)
+            # Индексы строятся при загрузке, как в окне
+            store.session_index()
+            store.skill_totals()
+            store.rollups()
+            store.rate_tracker(1).update_all()
+            results[str(lines)] = row = {}
+            for name in STAGES:
+                stage = globals()[f'stage_{name}']
+                row[name] = {
+                    'time': best_time(stage, path, store, repeat),
+                    'peak_kb': peak_memory(stage, path, store) // 1024,
+                }
+                print(f"{lines:>10} {name:<9} {row[name]['time']:9.4f} с {row[name]['peak_kb']:>10} КБ", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # Печатает отношение к базовому отчёту, возвращает число регрессий
+    regressions = 0
+    print(f"\nСравнение с базовым отчётом (допуск x{tolerance}):")
+    for lines, row in results.items():
+        for name, cur in row.items():
+            base = baseline.get(lines, {}).get(name)
+            if base is None:
+                continue
+            ratio = cur['time'] / base['time'] if base['time'] else 1.0
+            mem_ratio = cur['peak_kb'] / base['peak_kb'] if base['peak_kb'] else 1.0
+            slow = ratio > tolerance and cur['time'] >= MIN_TIME
+            fat = mem_ratio > tolerance and cur['peak_kb'] >= 1024
+            mark = "  РЕГРЕССИЯ" if slow or fat else ""
+            regressions += slow or fat
+            print(f"{lines:>10} {name:<9} время x{ratio:5.2f}  память x{mem_ratio:5.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер этапов SkillViewer на синтетических логах")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="число строк с приростом скилла")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--output', help="сохранить отчёт в JSON")
+    parser.add_argument('--compare', help="базовый JSON-отчёт для сравнения")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+    print(f"{'строк':>10} {'этап':<9} {'время':>11} {'пик памяти':>13}")
+    results = run(args.sizes, args.repeat)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# Генератор синтетического лога скиллов Wurm Online для замеров.
+# Похож на настоящий _Skills.txt: клиент запускается много раз (каждый запуск —
+# строка "Logging started"), между игровыми сессиями паузы, сессии переходят
+# через полночь без нового заголовка, десятки скиллов, числа с запятой,
+# служебные строки на русском, файл в cp1251.
+# Запуск: python benchmarks/loggen.py _Skills.txt [число строк] [--seed N]
+import argparse
+import datetime
+import random
+import sys
+
+LINES = 1_000_000
+SKILLS = [
+    'Mining', 'Digging', 'Body strength', 'Body stamina', 'Body control', 'Mind logic', 'Mind speed',
+    'Soul strength', 'Soul depth', 'Woodcutting', 'Carpentry', 'Fine carpentry', 'Masonry', 'Stone cutting',
+    'Blacksmithing', 'Weapon smithing', 'Blades smithing', 'Shield smithing', 'Chain armour smithing',
+    'Plate armour smithing', 'Jewelry smithing', 'Locksmithing', 'Tailoring', 'Leatherworking',
+    'Cloth tailoring', 'Farming', 'Gardening', 'Forestry', 'Foraging', 'Botanizing', 'Fishing', 'Cooking',
+    'Hot food cooking', 'Baking', 'Butchering', 'Animal husbandry', 'Animal taming', 'Milking', 'Pottery',
+    'Ropemaking', 'Coal-making', 'Paving', 'Archery', 'Swords', 'Longsword', 'Axes', 'Hatchet',
+    'Fighting', 'Aggressive fighting', 'Defensive fighting', 'Shield bashing', 'Prayer', 'Channeling',
+    'Exorcism', 'Healing', 'First aid', 'Nature', 'Climbing', 'Restoration', 'Thievery',
+]
+# Строки без прироста скилла, как в логе с русским клиентом
+NOISE = [
+    "Вы чувствуете себя отдохнувшим.",
+    "Ваш навык стал лучше, но вы устали.",
+    "Вы замечаете, что инструмент затупился.",
+    "Соединение с сервером восстановлено.",
+]
+NOISE_RATE = 0.03
+# Игровая сессия длится до нескольких часов, пауза между сессиями — до трёх
+# часов (дольше — уже новый запуск клиента с новым заголовком)
+SESSION_EVENTS = (200, 3000)
+SESSION_BREAK = (31 * 60, 3 * 3600)
+RUN_SESSIONS = (1, 6)
+RUN_BREAK = (6 * 3600, 3 * 86400)
+
+
+def number(value):
+    return f"{value:.4f}".replace('.', ',')
+
+
+def clock(sec):
+    return f"[{sec // 3600:02d}:{sec // 60 % 60:02d}:{sec % 60:02d}]"
+
+
+def generate_lines(lines, seed=1):
+    # Строки лога без '\n'; всего строк с приростом скилла — ровно lines
+    rnd = random.Random(seed)
+    values = {skill: rnd.uniform(1, 70) for skill in SKILLS}
+    # У персонажа есть основные занятия, остальные скиллы растут редко
+    weights = [rnd.paretovariate(1.2) for _ in SKILLS]
+    moment = datetime.datetime(2024, 1, 1, rnd.randrange(24), rnd.randrange(60))
+    written = 0
+    while written < lines:
+        yield f"Logging started {moment.date()}"
+        for _ in range(rnd.randint(*RUN_SESSIONS)):
+            skills = rnd.choices(SKILLS, weights, k=4)
+            for _ in range(rnd.randint(*SESSION_EVENTS)):
+                if written >= lines:
+                    return
+                moment += datetime.timedelta(seconds=rnd.randint(1, 20))
+                sec = moment.hour * 3600 + moment.minute * 60 + moment.second
+                if rnd.random() < NOISE_RATE:
+                    yield f"{clock(sec)} {rnd.choice(NOISE)}"
+                skill = rnd.choice(skills)
+                inc = rnd.uniform(0.0001, 0.01)
+                values[skill] += inc
+                yield f"{clock(sec)} {skill} increased by {number(inc)} to {number(values[skill])}"
+                written += 1
+            moment += datetime.timedelta(seconds=rnd.randint(*SESSION_BREAK))
+        moment += datetime.timedelta(seconds=rnd.randint(*RUN_BREAK))
+
+
+def write_log(path, lines, seed=1):
+    with open(path, 'w', encoding='cp1251', newline='\r\n') as f:
+        for line in generate_lines(lines, seed):
+            f.write(line + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетический лог скиллов Wurm Online")
+    parser.add_argument('path')
+    parser.add_argument('lines', type=int, nargs='?', default=LINES, help="число строк с приростом скилла")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    write_log(args.path, args.lines, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+# Время холодного запуска: от старта процесса до первого простоя Tk
+# (с SKILLVIEWER_STARTUP_PROBE окно закрывается сразу, как только показано).
+# Запуск:
+#   python benchmarks/startup_time.py                      — из исходников
+#   python benchmarks/startup_time.py --exe dist/SkillViewer.exe  — собранный exe
+#   python benchmarks/startup_time.py --import-only        — только импорт модуля (без экрана)
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RUNS = 5
+
+
+def command(args):
+    if args.exe:
+        return [args.exe]
+    if args.import_only:
+        return [sys.executable, '-c', 'import SkillViewer']
+    return [sys.executable, os.path.join(ROOT, 'SkillViewer.py')]
+
+
+def measure(cmd, runs):
+    env = dict(os.environ, SKILLVIEWER_STARTUP_PROBE='1')
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, env=env, check=True)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени запуска SkillViewer")
+    parser.add_argument('--exe', help="путь к собранному SkillViewer.exe")
+    parser.add_argument('--import-only', action='store_true', help="замерить только импорт SkillViewer")
+    parser.add_argument('--runs', type=int, default=RUNS)
+    args = parser.parse_args()
+    cmd = command(args)
+    # Первый запуск прогревает файловый кэш ОС и распаковку exe, в замер не идёт
+    measure(cmd, 1)
+    times = measure(cmd, args.runs)
+    print(f"{' '.join(cmd)}")
+    print(f"{args.runs} запусков: минимум {min(times):.3f} с, медиана {statistics.median(times):.3f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
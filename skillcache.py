@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from skilllog import file_encodings
+from skillstore import EventStore, Rollups
+
+# --- Кэш разобранных логов ---
+# Для каждого лога хранятся столбцы EventStore, итоги по часам (Rollups)
+# и позиция, до которой файл разобран.
+# Запись годится, пока начало файла не изменилось и файл не стал короче.
+# Записи для удалённых файлов и самые давние сверх лимитов удаляются.
+VERSION = 2
+MAX_BYTES = 256 * 1024 * 1024
+MAX_ENTRIES = 50
+
+
+def app_dir():
+    base = (os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'SkillViewer')
+
+
+def cache_key(filepath):
+    return os.path.normcase(os.path.abspath(filepath))
+
+
+def head_hash(head):
+    return hashlib.sha1(head).hexdigest()
+
+
+class ParseCache:
+    def __init__(self, path=None, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES):
+        self.path = path or os.path.join(app_dir(), 'parse_cache.sqlite3')
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    def connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = sqlite3.connect(self.path)
+        if db.execute("PRAGMA user_version").fetchone()[0] != VERSION:
+            db.execute("DROP TABLE IF EXISTS logs")
+            db.execute(f"PRAGMA user_version = {VERSION}")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS logs (
+                path TEXT PRIMARY KEY,
+                size INTEGER, mtime REAL, head_hash TEXT,
+                offset INTEGER, encoding TEXT, day INTEGER, last INTEGER,
+                skills TEXT, ts BLOB, skill_ids BLOB, increases BLOB, vals BLOB,
+                rollup_keys BLOB, rollup_values BLOB, rollup_last BLOB,
+                bytes INTEGER, used REAL
+            )""")
+        return db
+
+    def load(self, follower):
+        # Берёт разобранное из кэша и дочитывает хвост; без кэша разбирает файл целиком
+        if self.restore(follower):
+            follower.poll()
+        else:
+            follower.load()
+        self.save(follower)
+        return follower.store
+
+    def restore(self, follower):
+        try:
+            with open(follower.filepath, 'rb') as f:
+                st = os.fstat(f.fileno())
+                head = f.read(follower.HEAD_SIZE)
+            db = self.connect()
+            try:
+                row = db.execute(
+                    "SELECT size, mtime, head_hash, offset, encoding, day, last,"
+                    " skills, ts, skill_ids, increases, vals,"
+                    " rollup_keys, rollup_values, rollup_last FROM logs WHERE path = ?",
+                    (cache_key(follower.filepath),)
+                ).fetchone()
+                if row is None:
+                    return False
+                size, mtime, cached_hash, offset, encoding, day, last = row[:7]
+                # Файл не должен стать короче или переписаться без изменения размера,
+                # начало файла сравнивается по хэшу в пределах закэшированного
+                if (st.st_size < offset or (st.st_size == size and st.st_mtime != mtime)
+                        or head_hash(head[:min(offset, follower.HEAD_SIZE)]) != cached_hash):
+                    db.execute("DELETE FROM logs WHERE path = ?", (cache_key(follower.filepath),))
+                    db.commit()
+                    return False
+                store = EventStore()
+                for skill in json.loads(row[7]):
+                    store.skill_id(skill)
+                store.ts.frombytes(row[8])
+                store.skill_ids.frombytes(row[9])
+                store.increases.frombytes(row[10])
+                store.values.frombytes(row[11])
+                store.rollup = Rollups(store)
+                store.rollup.unpack(*row[12:15])
+                db.execute("UPDATE logs SET used = ? WHERE path = ?", (time.time(), cache_key(follower.filepath)))
+                db.commit()
+            finally:
+                db.close()
+        except (OSError, sqlite3.Error, ValueError):
+            return False
+        follower.store = store
+        follower.encoding = file_encodings[follower.filepath] = encoding
+        follower.offset = offset
+        follower.day = day
+        follower.last = last
+        follower.head = head
+        follower.inode = st.st_ino
+        return True
+
+    def save(self, follower):
+        store = follower.store
+        key = cache_key(follower.filepath)
+        try:
+            st = os.stat(follower.filepath)
+            db = self.connect()
+            try:
+                row = db.execute("SELECT offset FROM logs WHERE path = ?", (key,)).fetchone()
+                if row and row[0] == follower.offset:
+                    db.execute("UPDATE logs SET size = ?, mtime = ?, used = ? WHERE path = ?",
+                               (st.st_size, st.st_mtime, time.time(), key))
+                else:
+                    columns = [store.ts.tobytes(), store.skill_ids.tobytes(),
+                               store.increases.tobytes(), store.values.tobytes(),
+                               *store.rollups().pack()]
+                    head = follower.head[:min(follower.offset, follower.HEAD_SIZE)]
+                    db.execute(
+                        "INSERT OR REPLACE INTO logs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, st.st_size, st.st_mtime, head_hash(head),
+                         follower.offset, follower.encoding, follower.day, follower.last,
+                         json.dumps(store.skills), *columns,
+                         sum(len(c) for c in columns), time.time())
+                    )
+                db.commit()
+                self.evict(db)
+            finally:
+                db.close()
+        except (OSError, sqlite3.Error):
+            pass
+
+    def evict(self, db):
+        # Удаляет записи для исчезнувших файлов, затем самые давние сверх лимитов
+        rows = db.execute("SELECT path, bytes FROM logs ORDER BY used DESC").fetchall()
+        total = kept = 0
+        stale = []
+        for path, size in rows:
+            total += size
+            # Самую свежую запись оставляем всегда
+            if not os.path.exists(path) or (kept and (total > self.max_bytes or kept >= self.max_entries)):
+                stale.append(path)
+                total -= size
+                continue
+            kept += 1
+        if stale:
+            db.executemany("DELETE FROM logs WHERE path = ?", [(p,) for p in stale])
+            db.commit()
+            db.execute("VACUUM")
@@ -0,0 +1,464 @@
+import codecs
+import datetime
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import skillperf
+from skillstore import DAY, EventStore, day_start, merge_stores
+
+# --- Парсер лог-файла ---
+ENCODINGS = ['utf-8', 'cp1251', 'latin1']
+# Логи скиллов Wurm: _Skills.txt или помесячные _Skills.YYYY-MM.txt
+SKILL_LOG_RE = re.compile(r'^_skills(\.\d{4}-\d{2})?\.txt$', re.IGNORECASE)
+SAMPLE_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+date_re = re.compile(r'^Logging started (\d{4})-(\d{2})-(\d{2})')
+# Откат времени больше чем на час считаем переходом через полночь
+# (небольшие откаты бывают при переводе часов)
+ROLLBACK = 3600
+# "HH:MM:SS" -> секунд от начала дня, заполняется по мере встречи
+CLOCK = {}
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+# Кодировка определяется один раз на файл
+file_encodings = {}
+
+
+def detect_encoding(filepath):
+    encoding = file_encodings.get(filepath)
+    if encoding:
+        return encoding
+    with open(filepath, 'rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+    for encoding in ENCODINGS:
+        try:
+            # final=False: образец может оборваться посреди многобайтового символа
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            break
+        except UnicodeDecodeError:
+            continue
+    file_encodings[filepath] = encoding
+    return encoding
+
+
+def read_chunks(f, chunk_size=CHUNK_SIZE):
+    # Куски файла, заканчивающиеся на '\n'. Незавершённая последняя строка
+    # не отдаётся — её дочитаем, когда придёт перевод строки.
+    rest = b''
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            return
+        data = rest + data
+        end = data.rfind(b'\n') + 1
+        rest = data[end:]
+        if end:
+            yield data[:end]
+
+
+def decode_lines(chunks, encoding):
+    for chunk in chunks:
+        yield from chunk.decode(encoding, errors='replace').splitlines()
+
+
+def parse_lines(lines, store, day=None, last=0):
+    # Дописывает события в store. day — начало текущего дня в секундах (из
+    # "Logging started"), last — время последнего события от начала дня.
+    # Возвращает (day, last), чтобы следующий кусок файла разобрать с того же места.
+    # Строки отбираются дешёвыми проверками, время считается арифметически.
+    append_ts = store.ts.append
+    append_skill = store.skill_ids.append
+    append_inc = store.increases.append
+    append_value = store.values.append
+    skill_index = store.skill_index
+    clock = CLOCK
+    for line in lines:
+        if line[:1] == '[':
+            pos = line.find(' increased by ', 10)
+            if pos < 0 or day is None or line[9:11] != '] ':
+                continue
+            # "<прирост> to <значение>[ ...]"
+            parts = line[pos + 14:].split(' ', 3)
+            if len(parts) < 3 or parts[1] != 'to':
+                continue
+            key = line[1:9]
+            sec = clock.get(key)
+            try:
+                if sec is None:
+                    sec = clock[key] = int(key[:2]) * 3600 + int(key[3:5]) * 60 + int(key[6:])
+                inc = float(parts[0].replace(',', '.'))
+                newval = float(parts[2].replace(',', '.'))
+            except ValueError:
+                continue
+            if sec < last - ROLLBACK:
+                # Время ушло назад — сессия перевалила через полночь
+                day += DAY
+                last = sec
+            elif sec < last:
+                # Небольшой откат (перевод часов): время не уменьшается, события остаются по порядку
+                sec = last
+            else:
+                last = sec
+            skill = line[11:pos]
+            sid = skill_index.get(skill)
+            if sid is None:
+                sid = store.skill_id(skill)
+            append_ts(day + sec)
+            append_skill(sid)
+            append_inc(inc)
+            append_value(newval)
+        elif line.startswith('Logging started '):
+            m = date_re.match(line)
+            if m:
+                date = datetime.date(*map(int, m.groups()))
+                day = day_start(date)
+                last = 0
+    return day, last
+
+
+class LogFollower:
+    # Читает лог целиком один раз, дальше дочитывает только дописанные байты.
+    # Незавершённая последняя строка не разбирается, пока не придёт '\n'.
+    HEAD_SIZE = 256
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.store = EventStore()
+        self.encoding = None
+        self.offset = 0
+        self.day = None
+        self.last = 0
+        self.head = b''
+        self.inode = None
+
+    @skillperf.timed("parse", count=skillperf.result_len)
+    def load(self, progress=None, cancel=None):
+        # progress(n) вызывается на каждый прочитанный кусок в n байт,
+        # установленный cancel (threading.Event) прерывает чтение через LoadCancelled
+        self.encoding = detect_encoding(self.filepath)
+        self.store = EventStore()
+        with open(self.filepath, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.head = f.read(self.HEAD_SIZE)
+            f.seek(0)
+            self.offset = 0
+            self.day, self.last = parse_lines(self.read_lines(f, progress, cancel), self.store)
+        return self.store
+
+    def read_new(self):
+        # Разбирает дописанное в отдельное хранилище; ни self.store, ни позицию разбора
+        # не меняет (можно из фонового потока). Возвращает (новые события, состояние
+        # разбора после них для advance) или (None, None), если файл надо перечитать заново.
+        st = os.stat(self.filepath)
+        if self.is_replaced(st):
+            file_encodings.pop(self.filepath, None)
+            return None, None
+        chunk = EventStore()
+        state = (self.offset, self.day, self.last, self.head)
+        if st.st_size <= self.offset:
+            return chunk, state
+        read = 0
+
+        def counted(chunks):
+            nonlocal read
+            for data in chunks:
+                read += len(data)
+                yield data
+
+        with open(self.filepath, 'rb') as f:
+            head = self.head if len(self.head) >= self.HEAD_SIZE else f.read(self.HEAD_SIZE)
+            f.seek(self.offset)
+            day, last = parse_lines(decode_lines(counted(read_chunks(f)), self.encoding), chunk, self.day, self.last)
+        return chunk, (self.offset + read, day, last, head)
+
+    def advance(self, state):
+        # Позиция разбора переходит за события, уже дописанные в self.store
+        self.offset, self.day, self.last, self.head = state
+
+    def poll(self):
+        # Возвращает (число новых событий в self.store, был ли файл перечитан заново)
+        chunk, state = self.read_new()
+        if chunk is None:
+            self.load()
+            return len(self.store), True
+        self.store.extend(chunk)
+        self.advance(state)
+        return len(chunk), False
+
+    def read_lines(self, f, progress=None, cancel=None):
+        # Строки с текущей позиции до конца файла; offset сдвигается по мере чтения
+        return decode_lines(self.count_offset(read_chunks(f), progress, cancel), self.encoding)
+
+    def count_offset(self, chunks, progress=None, cancel=None):
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                raise LoadCancelled()
+            self.offset += len(chunk)
+            if progress:
+                progress(len(chunk))
+            yield chunk
+
+    def is_replaced(self, st):
+        # Файл обрезан, подменён (ротация) или изменилось его начало
+        if st.st_size < self.offset:
+            return True
+        if st.st_ino and self.inode and st.st_ino != self.inode:
+            return True
+        with open(self.filepath, 'rb') as f:
+            head = f.read(len(self.head))
+        return head != self.head
+
+
+def event_clock(line):
+    # Время "HH:MM:SS" строки прироста скилла (bytes) в секундах или None.
+    # Те же проверки, что в parse_lines: по этим строкам считаются переходы через полночь.
+    if line[:1] != b'[' or line[9:11] != b'] ':
+        return None
+    pos = line.find(b' increased by ', 10)
+    if pos < 0:
+        return None
+    parts = line[pos + 14:].split(b' ', 3)
+    if len(parts) < 3 or parts[1] != b'to':
+        return None
+    try:
+        float(parts[0].replace(b',', b'.'))
+        float(parts[2].replace(b',', b'.'))
+        return int(line[1:3]) * 3600 + int(line[4:6]) * 60 + int(line[7:9])
+    except ValueError:
+        return None
+
+
+@skillperf.timed("read_latest", count=skillperf.result_len)
+def read_latest(filepath, minutes):
+    # События последних minutes минут лога (считая от последнего события)
+    # без разбора всей истории. Файл отображается в память и просматривается
+    # с конца до заголовка "Logging started", от которого известна дата;
+    # если окно начинается раньше заголовка, просмотр идёт до следующего.
+    encoding = detect_encoding(filepath)
+    store = EventStore()
+    with open(filepath, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return store
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Незавершённая последняя строка не разбирается, как и в LogFollower
+            end = pos = mm.rfind(b'\n') + 1
+            segments = []  # (начало, конец, начало дня первого события) участков окна
+            events = []    # (начало строки, время от начала дня, полуночей до конца участка)
+            seg_end = end
+            days = 0
+            prev = None
+            bound = None   # время начала окна, известно после первого заголовка
+            inside = True
+            while pos > 0:
+                start = mm.rfind(b'\n', 0, pos - 1) + 1
+                line = mm[start:pos].rstrip(b'\r\n')
+                pos = start
+                if line.startswith(b'Logging started '):
+                    m = date_re.match(line.decode('ascii', 'replace'))
+                    if not m:
+                        continue
+                    if events:
+                        base = day_start(datetime.date(*map(int, m.groups()))) + days * DAY
+                        if bound is None:
+                            bound = base + events[0][1] - minutes * 60
+                        keep = 0
+                        for line_start, sec, d in events:
+                            if base - d * DAY + sec < bound:
+                                break
+                            keep += 1
+                        if keep:
+                            line_start, sec, d = events[keep - 1]
+                            segments.append((line_start, seg_end, base - d * DAY))
+                        if keep < len(events):
+                            break
+                    seg_end = start
+                    events = []
+                    days = 0
+                    prev = None
+                    continue
+                sec = event_clock(line)
+                if sec is None:
+                    continue
+                if prev is not None and sec > prev + ROLLBACK:
+                    days += 1
+                prev = sec
+                if not inside:
+                    continue
+                events.append((start, sec, days))
+                # В последнем участке окно отсчитывается от последнего события,
+                # дальше нужны только переходы через полночь
+                if bound is None and sec - days * DAY < events[0][1] - minutes * 60:
+                    inside = False
+            for start, stop, day in reversed(segments):
+                parse_lines(decode_lines([mm[start:stop]], encoding), store, day)
+    return store
+
+
+def parse_log_file(filepath):
+    return LogFollower(filepath).load()
+
+
+def load_follower(filepath):
+    # Выполняется в отдельном процессе: возвращает разобранный лог целиком
+    follower = LogFollower(filepath)
+    follower.load()
+    return follower
+
+
+def load_parallel(paths, progress=None, cancel=None):
+    workers = min(len(paths), os.cpu_count() or 1)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(load_follower, path): path for path in paths}
+        parsed = {}
+        for future in as_completed(futures):
+            if cancel is not None and cancel.is_set():
+                raise LoadCancelled()
+            path = futures[future]
+            parsed[path] = future.result()
+            if progress:
+                progress(os.path.getsize(path))
+        return parsed
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def discover_skill_logs(folder):
+    # Логи скиллов в папке персонажа (или в её подпапке logs)
+    for path in (folder, os.path.join(folder, 'logs')):
+        if os.path.isdir(path):
+            logs = sorted(os.path.join(path, name) for name in os.listdir(path) if SKILL_LOG_RE.match(name))
+            if logs:
+                return logs
+    return []
+
+
+def character_name(paths):
+    # Имя персонажа — папка игрока (.../players/<Имя>/logs/_Skills.txt)
+    folder = os.path.dirname(os.path.abspath(paths[0]))
+    if os.path.basename(folder).lower() == 'logs':
+        folder = os.path.dirname(folder)
+    return os.path.basename(folder) or folder
+
+
+class LogSet:
+    # Один или несколько логов одного персонажа в общем хранилище.
+    # Несколько файлов разбираются параллельно в процессах, дальше
+    # дочитывается только самый свежий (в него пишет игра). Новый месяц игра
+    # начинает в новом _Skills.YYYY-MM.txt в той же папке — он добавляется в набор.
+    def __init__(self, paths, cache=None):
+        self.paths = list(paths)
+        self.cache = cache
+        self.followers = []
+        self.follower = None
+        self.store = EventStore()
+        self.pending = None  # (прочитанные события, состояние разбора после них) до append()
+        self.folder = os.path.dirname(os.path.abspath(self.paths[0]))
+        # Логи, что уже были в папке: старые месяцы, не выбранные для открытия, не добавляются
+        self.known = set(self.folder_logs()) | {os.path.abspath(path) for path in self.paths}
+
+    def folder_logs(self):
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return []
+        return [os.path.join(self.folder, name) for name in names if SKILL_LOG_RE.match(name)]
+
+    def new_logs(self):
+        return sorted(path for path in self.folder_logs() if path not in self.known)
+
+    def watches(self, path):
+        # Изменение этого файла касается набора: файл, в который пишет игра, или новый лог в папке
+        return path == self.follower.filepath or (
+            os.path.dirname(os.path.abspath(path)) == self.folder
+            and SKILL_LOG_RE.match(os.path.basename(path)) is not None
+        )
+
+    @skillperf.timed("load", count=skillperf.result_len)
+    def load(self, progress=None, cancel=None):
+        # progress(доля от 0 до 1) — ход разбора, cancel — threading.Event для отмены
+        followers = [LogFollower(path) for path in self.paths]
+        missing = []
+        for follower in followers:
+            if self.cache and self.cache.restore(follower):
+                follower.poll()
+            else:
+                missing.append(follower)
+        total = sum(os.path.getsize(f.filepath) for f in missing) or 1
+        done = 0
+
+        def report(size):
+            nonlocal done
+            done += size
+            if progress:
+                progress(min(done / total, 1.0))
+
+        parsed = {}
+        if len(missing) > 1:
+            try:
+                parsed = load_parallel([f.filepath for f in missing], report, cancel)
+            except (OSError, BrokenProcessPool):
+                pass  # без процессов разберём по очереди
+        for i, follower in enumerate(followers):
+            if follower.filepath in parsed:
+                followers[i] = parsed[follower.filepath]
+                file_encodings[follower.filepath] = followers[i].encoding
+            elif follower in missing:
+                follower.load(report, cancel)
+        if self.cache:
+            for follower in followers:
+                self.cache.save(follower)
+        self.followers = followers
+        self.follower = max(followers, key=lambda f: os.path.getmtime(f.filepath))
+        if len(followers) == 1:
+            self.store = self.follower.store
+        else:
+            self.store = merge_stores([f.store for f in followers])
+        return self.store
+
+    @skillperf.timed("read_new", count=lambda result, *args: skillperf.result_len(result[0]))
+    def read_new(self):
+        # Можно вызывать из фонового потока: хранилища и позиция разбора не меняются,
+        # пока не вызван append(). Если события так и не дописаны, они прочитаются снова.
+        new = self.new_logs()
+        if new:
+            # Игра начала новый файл: набор перечитывается (старые — из кэша), дальше следим за новым
+            self.known.update(new)
+            self.paths += new
+            self.load()
+            return None, True
+        chunk, state = self.follower.read_new()
+        if chunk is None:
+            # Файл подменён: набор перечитывается в новые объекты, подменяются они разом
+            self.load()
+            return None, True
+        self.pending = (chunk, state)
+        return chunk, False
+
+    def append(self, chunk):
+        pending, self.pending = self.pending, None
+        self.follower.store.extend(chunk)
+        if self.store is not self.follower.store:
+            self.store.extend(chunk)
+        if pending and pending[0] is chunk:
+            self.follower.advance(pending[1])
+        return len(chunk)
+
+    def poll(self):
+        # Возвращает (число новых событий в self.store, было ли всё перечитано заново)
+        chunk, reloaded = self.read_new()
+        if reloaded:
+            return len(self.store), True
+        return self.append(chunk), False
+
+    def save(self):
+        if self.cache and self.follower:
+            self.cache.save(self.follower)
@@ -0,0 +1,94 @@
+import collections
+import functools
+import json
+import os
+import threading
+import time
+
+# --- Замеры производительности ---
+# Обёрнутые функции записывают длительность вызова и число обработанных событий.
+# Пока замеры выключены, обёртка только проверяет флаг и вызывает функцию.
+# Включаются переменной окружения SKILLVIEWER_PERF=1 или из окна отладки.
+WINDOW = 500  # сколько последних вызовов хранить на каждый этап
+
+enabled = bool(os.environ.get("SKILLVIEWER_PERF"))
+samples = {}  # этап -> deque[(время вызова, длительность, событий)]
+calls = collections.Counter()
+lock = threading.Lock()
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def record(name, seconds, count=0):
+    # Вызывается и из фоновых потоков загрузки
+    with lock:
+        buf = samples.get(name)
+        if buf is None:
+            buf = samples[name] = collections.deque(maxlen=WINDOW)
+        buf.append((time.time(), seconds, count))
+        calls[name] += 1
+
+
+def snapshot():
+    with lock:
+        return {name: list(buf) for name, buf in samples.items()}, dict(calls)
+
+
+def timed(name, count=None):
+    # count(результат, *аргументы) -> число событий, посчитанное после вызова
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            record(name, seconds, count(result, *args, **kwargs) if count else 0)
+            return result
+        return wrapper
+    return decorator
+
+
+def result_len(result, *args, **kwargs):
+    # count для функций, возвращающих хранилище или список событий
+    return len(result) if result is not None else 0
+
+
+def percentile(values, q):
+    # values отсортированы; ближайший ранг
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def stats():
+    # Этап -> сводка по последним WINDOW вызовам, длительности в миллисекундах
+    rows_by_name, counts = snapshot()
+    result = {}
+    for name, rows in sorted(rows_by_name.items()):
+        durations = sorted(row[1] * 1000 for row in rows)
+        result[name] = {
+            'calls': counts[name],
+            'last_ms': rows[-1][1] * 1000,
+            'p50_ms': percentile(durations, 0.5),
+            'p90_ms': percentile(durations, 0.9),
+            'p99_ms': percentile(durations, 0.99),
+            'max_ms': durations[-1],
+            'events': sum(row[2] for row in rows) / len(rows),
+        }
+    return result
+
+
+def dump(path):
+    # Сводка и сами замеры в JSON
+    data = {'stats': stats(), 'samples': snapshot()[0]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+
+
+def reset():
+    with lock:
+        samples.clear()
+        calls.clear()
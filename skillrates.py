@@ -0,0 +1,123 @@
+import numpy as np
+
+# --- Скорость прокачки ---
+# Ряды скилла берутся из EventStore как массивы NumPy (время в секундах, значение),
+# скорости считаются за один векторный проход, в единицах "прирост за час".
+
+
+def skill_series(store, events, skill):
+    # events — диапазон индексов в store; срез копируется, чтобы store можно было дописывать
+    if not len(events):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    lo, hi = events[0], events[-1] + 1
+    sid = store.skill_index.get(skill)
+    ts = np.frombuffer(store.ts[lo:hi], dtype=np.int64)
+    mask = np.frombuffer(store.skill_ids[lo:hi], dtype=np.uint16) == sid
+    values = np.frombuffer(store.values[lo:hi], dtype=np.float64)
+    return ts[mask], values[mask]
+
+
+def last_streak(ts, gap_seconds):
+    # Начало последней серии событий без пауз длиннее gap_seconds
+    breaks = np.flatnonzero(np.diff(ts) > gap_seconds)
+    return breaks[-1] + 1 if len(breaks) else 0
+
+
+def period_slice(ts, values, gap_min, period_min):
+    # Последние period_min минут последней непрерывной серии
+    start = last_streak(ts, gap_min * 60)
+    ts, values = ts[start:], values[start:]
+    if not len(ts):
+        return ts, values
+    first = np.searchsorted(ts, ts[-1] - period_min * 60, side='left')
+    return ts[first:], values[first:]
+
+
+def instant_rates(ts, values):
+    # Прирост за час между соседними событиями (события в одну секунду пропускаются)
+    dt = np.diff(ts)
+    ok = dt > 0
+    rates = np.diff(values)[ok] / dt[ok] * 3600
+    return ts[1:][ok], rates
+
+
+def rolling_rates(ts, values, window_min):
+    # Прирост за час за последние window_min минут до каждого события
+    start = np.searchsorted(ts, ts - window_min * 60, side='left')
+    dt = ts - ts[start]
+    ok = dt > 0
+    rates = (values[ok] - values[start[ok]]) / dt[ok] * 3600
+    return ts[ok], rates
+
+
+def gain_rates(ts, values, window_min=0):
+    if window_min:
+        return rolling_rates(ts, values, window_min)
+    return instant_rates(ts, values)
+
+
+# --- Прореживание для отрисовки ---
+def minmax_downsample(x, y, max_points):
+    # В каждой корзине оставляются минимум и максимум — пики не теряются
+    n = len(x)
+    buckets = max_points // 2
+    if n <= max_points or buckets < 1:
+        return x, y
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    first = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+    keep = np.unique(np.r_[order[first], order[last]])
+    return x[keep], y[keep]
+
+
+def lttb_downsample(x, y, max_points):
+    # Largest-Triangle-Three-Buckets: сохраняет форму линии на max_points точках
+    n = len(x)
+    if n <= max_points or max_points < 3:
+        return x, y
+    xf = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = xf[nlo:nhi].mean() if nhi > nlo else xf[-1]
+        avg_y = y[nlo:nhi].mean() if nhi > nlo else y[-1]
+        area = np.abs((xf[a] - avg_x) * (y[lo:hi] - y[a]) - (xf[a] - xf[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def downsample(x, y, max_points, method='lttb'):
+    if method == 'minmax':
+        return minmax_downsample(x, y, max_points)
+    return lttb_downsample(x, y, max_points)
+
+
+# --- Итоги по часам и дням ---
+# Строятся из Rollups: число ячеек зависит от выбранного числа дней, а не от длины лога.
+ROLLUP_METRICS = {'gain': 0, 'events': 1, 'active': 2}
+
+
+def rollup_value(row, metric):
+    # Активное время — в минутах
+    value = row[ROLLUP_METRICS[metric]]
+    return value / 60 if metric == 'active' else value
+
+
+def hour_matrix(rollups, first_day, days, skill=None, metric='gain'):
+    # Дни (строки) на часы (столбцы), начиная с дня first_day (номер дня от эпохи)
+    matrix = np.zeros((days, 24))
+    for d in range(days):
+        base = (first_day + d) * 24
+        for h in range(24):
+            matrix[d, h] = rollup_value(rollups.hour(base + h, skill), metric)
+    return matrix
+
+
+def day_values(rollups, first_day, days, skill=None, metric='gain'):
+    return np.array([rollup_value(rollups.day(first_day + d, skill), metric) for d in range(days)])
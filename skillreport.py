@@ -0,0 +1,148 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import sys
+
+from skillcache import ParseCache
+from skilllog import LogSet, discover_skill_logs, read_latest
+from skillstore import DAY, day_start, to_datetime, to_timestamp
+
+# --- Отчёт из командной строки ---
+# Использует тот же разбор и суммирование, что и окно программы,
+# но не загружает tkinter и matplotlib.
+# Пример: python SkillViewer.py report --log _Skills.txt --from 2024-01-01 --to 2024-01-31 --format csv
+FIELDS = {
+    'session': ['start', 'end', 'skill', 'increase', 'new_value'],
+    'day': ['date', 'skill', 'increase', 'new_value'],
+    'total': ['skill', 'increase', 'new_value'],
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="SkillViewer.py report", description="Прирост скиллов по логам Wurm Online")
+    parser.add_argument('--log', action='append', required=True,
+                        help="лог-файл или папка с логами персонажа (можно несколько раз)")
+    parser.add_argument('--from', dest='date_from', help="начало: YYYY-MM-DD или YYYY-MM-DD HH:MM")
+    parser.add_argument('--to', dest='date_to', help="конец: YYYY-MM-DD (весь день) или YYYY-MM-DD HH:MM")
+    parser.add_argument('--by', choices=sorted(FIELDS), default='session', help="группировка строк")
+    parser.add_argument('--last', type=int, metavar='MIN',
+                        help="только последние MIN минут самого свежего лога, без разбора всей истории")
+    parser.add_argument('--gap', type=int, default=30, help="пауза между сессиями, мин")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--output', help="файл для отчёта (по умолчанию stdout)")
+    parser.add_argument('--no-cache', action='store_true', help="не использовать кэш разбора")
+    return parser.parse_args(argv)
+
+
+def parse_time(value, end=False):
+    if value is None:
+        return None
+    moment = datetime.datetime.fromisoformat(value)
+    ts = to_timestamp(moment)
+    # Для конца диапазона дата без времени означает весь день
+    if end and len(value) <= 10:
+        ts += DAY - 1
+    return ts
+
+
+def log_paths(logs):
+    paths = []
+    for path in logs:
+        paths.extend(discover_skill_logs(path) if os.path.isdir(path) else [path])
+    return paths
+
+
+def skill_rows(store, events):
+    # Как в таблице окна: прирост по скиллам, по убыванию прироста
+    data = store.aggregate(events)
+    for skill, (increase, new_value) in sorted(data.items(), key=lambda x: x[1][0], reverse=True):
+        yield {'skill': skill, 'increase': round(increase, 6), 'new_value': round(new_value, 6)}
+
+
+def clip(events, selected):
+    return range(max(events.start, selected.start), min(events.stop, selected.stop))
+
+
+def report_rows(store, t_from, t_to, by, gap):
+    selected = store.select(t_from, t_to)
+    if not selected:
+        return
+    if by == 'total':
+        yield from skill_rows(store, selected)
+        return
+    index = store.session_index(gap)
+    if by == 'session':
+        # Сессия через полночь — одна строка группы, время с датой
+        for k in range(index.session_of(selected[0]), index.session_of(selected[-1]) + 1):
+            events = clip(index.session(k), selected)
+            start = to_datetime(store.ts[events[0]]).strftime('%Y-%m-%d %H:%M:%S')
+            end = to_datetime(store.ts[events[-1]]).strftime('%Y-%m-%d %H:%M:%S')
+            for row in skill_rows(store, events):
+                yield {'start': start, 'end': end, **row}
+        return
+    first_day, last_day = store.ts[selected[0]] // DAY, store.ts[selected[-1]] // DAY
+    for date in index.dates():
+        if first_day <= day_start(date) // DAY <= last_day:
+            for row in skill_rows(store, clip(index.day_range(date), selected)):
+                yield {'date': str(date), **row}
+
+
+def write_csv(rows, fields, out):
+    writer = csv.DictWriter(out, fieldnames=fields, lineterminator='\n')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def write_json(rows, out):
+    # Массив пишется по одному объекту, без накопления всего отчёта в памяти
+    out.write('[')
+    for i, row in enumerate(rows):
+        out.write(',\n' if i else '\n')
+        out.write(json.dumps(row, ensure_ascii=False))
+    out.write('\n]\n')
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        t_from = parse_time(args.date_from)
+        t_to = parse_time(args.date_to, end=True)
+    except ValueError as e:
+        print(f"Некорректная дата: {e}", file=sys.stderr)
+        return 2
+    paths = log_paths(args.log)
+    if not paths:
+        print("Не найдено логов скиллов.", file=sys.stderr)
+        return 1
+    try:
+        if args.last:
+            # Последние минуты читаются с конца файла, в который пишет игра
+            store = read_latest(max(paths, key=os.path.getmtime), args.last)
+        else:
+            store = LogSet(paths, None if args.no_cache else ParseCache()).load()
+    except OSError as e:
+        print(f"Не удалось прочитать лог: {e}", file=sys.stderr)
+        return 1
+    rows = report_rows(
+        store,
+        t_from if t_from is not None else -sys.maxsize,
+        t_to if t_to is not None else sys.maxsize,
+        args.by, args.gap
+    )
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'csv':
+            write_csv(rows, FIELDS[args.by], out)
+        else:
+            write_json(rows, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
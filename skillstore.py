@@ -0,0 +1,468 @@
+import array
+import bisect
+import datetime
+import math
+
+# --- Хранилище событий ---
+# Время хранится в секундах от EPOCH по локальным часам лога (без часовых поясов)
+EPOCH = datetime.datetime(1970, 1, 1)
+DAY = 86400
+HOUR = 3600
+
+
+def to_timestamp(dt):
+    return int((dt - EPOCH).total_seconds())
+
+
+def to_datetime(ts):
+    return EPOCH + datetime.timedelta(seconds=ts)
+
+
+def day_start(date):
+    return (date - EPOCH.date()).days * DAY
+
+
+def day_date(day):
+    return EPOCH.date() + datetime.timedelta(days=day)
+
+
+class EventStore:
+    # События лежат в параллельных массивах: время, id скилла, прирост, значение.
+    # Имена скиллов интернированы в self.skills, в массиве хранится только индекс.
+    # События идут по возрастанию времени, поэтому диапазоны ищутся бинарным поиском.
+    def __init__(self):
+        self.ts = array.array('q')
+        self.skill_ids = array.array('H')
+        self.increases = array.array('d')
+        self.values = array.array('d')
+        self.skills = []
+        self.skill_index = {}
+        self.session_indexes = {}  # порог разрыва (мин) -> SessionIndex
+        self.prefix_sums = None    # SkillTotals, строится при первом обращении
+        self.rollup = None         # Rollups, строится при первом обращении
+        self.rate_trackers = {}    # порог разрыва (мин) -> RateTracker
+
+    def __len__(self):
+        return len(self.ts)
+
+    def skill_id(self, skill):
+        sid = self.skill_index.get(skill)
+        if sid is None:
+            sid = len(self.skills)
+            self.skills.append(skill)
+            self.skill_index[skill] = sid
+        return sid
+
+    def append(self, ts, skill, increase, new_value):
+        self.ts.append(ts)
+        self.skill_ids.append(self.skill_id(skill))
+        self.increases.append(increase)
+        self.values.append(new_value)
+
+    def extend(self, other, start=0):
+        # Дописывает события other начиная с индекса start.
+        # Id скиллов другого хранилища переводятся в свои.
+        remap = [self.skill_id(skill) for skill in other.skills]
+        self.ts.extend(other.ts[start:])
+        self.skill_ids.extend(array.array('H', map(remap.__getitem__, other.skill_ids[start:])))
+        self.increases.extend(other.increases[start:])
+        self.values.extend(other.values[start:])
+
+    def sort(self):
+        # Устойчивая сортировка по времени (для слияния пересекающихся логов)
+        order = sorted(range(len(self.ts)), key=self.ts.__getitem__)
+        for name in ('ts', 'skill_ids', 'increases', 'values'):
+            column = getattr(self, name)
+            setattr(self, name, array.array(column.typecode, map(column.__getitem__, order)))
+        self.session_indexes = {}
+        self.prefix_sums = None
+        self.rollup = None
+        self.rate_trackers = {}
+
+    def select(self, t_from, t_to):
+        # Индексы событий с t_from <= время <= t_to
+        return range(bisect.bisect_left(self.ts, t_from), bisect.bisect_right(self.ts, t_to))
+
+    def session_index(self, gap_minutes=30):
+        # Индекс строится один раз на порог и дальше только дополняется новыми событиями
+        index = self.session_indexes.get(gap_minutes)
+        if index is None:
+            index = self.session_indexes[gap_minutes] = SessionIndex(self, gap_minutes)
+        index.extend()
+        return index
+
+    def skill_totals(self):
+        # Накопленные суммы по скиллам; дополняются новыми событиями, как индекс сессий
+        if self.prefix_sums is None:
+            self.prefix_sums = SkillTotals(self)
+        self.prefix_sums.extend()
+        return self.prefix_sums
+
+    def rollups(self):
+        # Итоги по часам и дням; дополняются новыми событиями, как индекс сессий
+        if self.rollup is None:
+            self.rollup = Rollups(self)
+        self.rollup.extend()
+        return self.rollup
+
+    def rate_tracker(self, gap_minutes):
+        # Текущая скорость прокачки по скиллам; состояние скилла дополняется его новыми событиями
+        tracker = self.rate_trackers.get(gap_minutes)
+        if tracker is None:
+            tracker = self.rate_trackers[gap_minutes] = RateTracker(self, gap_minutes)
+        return tracker
+
+    def skills_in(self, indices):
+        skill_ids = self.skill_ids
+        return sorted({self.skills[sid] for sid in {skill_ids[i] for i in indices}})
+
+    def aggregate(self, indices):
+        # Суммарный прирост и последнее значение по каждому скиллу.
+        # Непрерывный диапазон считается по накопленным суммам, без прохода по событиям.
+        if isinstance(indices, range) and indices.step == 1:
+            return self.skill_totals().totals(indices.start, indices.stop) if len(indices) else {}
+        totals = {}
+        skill_ids, increases, values = self.skill_ids, self.increases, self.values
+        for i in indices:
+            sid = skill_ids[i]
+            inc, _ = totals.get(sid, (0.0, 0.0))
+            totals[sid] = (inc + increases[i], values[i])
+        return {self.skills[sid]: vals for sid, vals in totals.items()}
+
+
+def merge_stores(stores):
+    # Объединяет хранилища нескольких логов в одно, упорядоченное по времени
+    stores = sorted((s for s in stores if len(s)), key=lambda s: s.ts[0])
+    merged = EventStore()
+    for store in stores:
+        merged.extend(store)
+    if any(a.ts[-1] > b.ts[0] for a, b in zip(stores, stores[1:])):
+        merged.sort()
+    # Итоги по часам уже посчитанных логов складываются, а не считаются заново
+    if stores and all(store.rollup is not None for store in stores):
+        merged.rollup = Rollups.merged(merged, [store.rollups() for store in stores])
+    return merged
+
+
+class SessionIndex:
+    # Сессии по всей ленте событий: новая сессия начинается после паузы больше
+    # gap_minutes, переход через полночь сессию не разрывает. Индекс строится за
+    # один проход и дальше только дополняется новыми событиями.
+    def __init__(self, store, gap_minutes=30):
+        self.store = store
+        self.gap = gap_minutes * 60
+        self.starts = array.array('q')  # индекс первого события каждой сессии
+        self.days = {}  # номер дня -> [lo, hi]
+        self.count = 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def extend(self):
+        ts = self.store.ts
+        n = len(ts)
+        if self.count >= n:
+            return
+        day = last = None
+        if self.count:
+            last = ts[self.count - 1]
+            day = last // DAY
+        gap = self.gap
+        starts = self.starts
+        days = self.days
+        for i in range(self.count, n):
+            t = ts[i]
+            if last is None or t - last > gap:
+                starts.append(i)
+            d = t // DAY
+            if d != day:
+                if day is not None:
+                    days[day][1] = i
+                day = d
+                days[d] = [i, n]
+            last = t
+        days[day][1] = n
+        self.count = n
+
+    def session(self, k):
+        # k-я сессия как диапазон индексов событий
+        hi = self.starts[k + 1] if k + 1 < len(self.starts) else self.count
+        return range(self.starts[k], hi)
+
+    def sessions(self):
+        return [self.session(k) for k in range(len(self.starts))]
+
+    def session_of(self, i):
+        # Номер сессии, в которую входит событие i
+        return bisect.bisect_right(self.starts, i) - 1
+
+    def dates(self):
+        return [day_date(d) for d in sorted(self.days)]
+
+    def day_range(self, date):
+        lo, hi = self.days.get(day_start(date) // DAY, (0, 0))
+        return range(lo, hi)
+
+    def sessions_for(self, date):
+        # Сессии с событиями этого дня целиком, в том числе начатые накануне
+        # или закончившиеся на следующий день
+        events = self.day_range(date)
+        if not events:
+            return []
+        return [self.session(k) for k in range(self.session_of(events[0]), self.session_of(events[-1]) + 1)]
+
+
+class SkillTotals:
+    # Для каждого скилла: индексы его событий и накопленный прирост перед каждым из них.
+    # Прирост и последнее значение на диапазоне событий — два бинарных поиска на скилл.
+    def __init__(self, store):
+        self.store = store
+        self.positions = []   # id скилла -> индексы его событий в store
+        self.cumulative = []  # id скилла -> [0, прирост первого, первого + второго, ...]
+        self.count = 0
+
+    def extend(self):
+        store = self.store
+        n = len(store)
+        if self.count >= n:
+            return
+        positions, cumulative = self.positions, self.cumulative
+        while len(positions) < len(store.skills):
+            positions.append(array.array('q'))
+            cumulative.append(array.array('d', [0.0]))
+        skill_ids, increases = store.skill_ids, store.increases
+        for i in range(self.count, n):
+            sid = skill_ids[i]
+            positions[sid].append(i)
+            cum = cumulative[sid]
+            cum.append(cum[-1] + increases[i])
+        self.count = n
+
+    def totals(self, lo, hi):
+        # {скилл: (прирост, последнее значение)} для событий с индексами lo <= i < hi
+        result = {}
+        skills, values = self.store.skills, self.store.values
+        for sid, pos in enumerate(self.positions):
+            a = bisect.bisect_left(pos, lo)
+            b = bisect.bisect_left(pos, hi, a)
+            if b > a:
+                cum = self.cumulative[sid]
+                result[skills[sid]] = (cum[b] - cum[a], values[pos[b - 1]])
+        return result
+
+
+def add_row(buckets, key, inc, count, active):
+    # Прибавляет к итогу [прирост, событий, активных секунд] под ключом key
+    row = buckets.get(key)
+    if row is None:
+        buckets[key] = [inc, count, active]
+    else:
+        row[0] += inc
+        row[1] += count
+        row[2] += active
+
+
+class Rollups:
+    # Прирост, число событий и активное время (сек) по часам и по дням,
+    # для каждого скилла и для всех вместе (id скилла ALL).
+    # Активное время — паузы между соседними событиями не длиннее ACTIVE_GAP,
+    # записанные в час последнего из двух событий.
+    ALL = -1
+    ACTIVE_GAP = 5 * 60
+
+    def __init__(self, store):
+        self.store = store
+        self.hourly = {}  # (номер часа, id скилла) -> [прирост, событий, активных секунд]
+        self.daily = {}   # (номер дня, id скилла) -> [прирост, событий, активных секунд]
+        self.last = {}    # id скилла -> время его последнего события
+        self.count = 0
+
+    def extend(self):
+        store = self.store
+        n = len(store)
+        if self.count >= n:
+            return
+        ts, skill_ids, increases = store.ts, store.skill_ids, store.increases
+        hourly, last = self.hourly, self.last
+        all_id, active_gap = self.ALL, self.ACTIVE_GAP
+        delta = {}  # прибавка к часам за этот вызов
+        last_all = last.get(all_id)
+        for i in range(self.count, n):
+            t = ts[i]
+            sid = skill_ids[i]
+            inc = increases[i]
+            hour = t // HOUR
+            prev = last.get(sid)
+            active = t - prev if prev is not None and 0 <= t - prev <= active_gap else 0
+            if prev is None or t > prev:
+                last[sid] = t
+            active_all = t - last_all if last_all is not None and 0 <= t - last_all <= active_gap else 0
+            if last_all is None or t > last_all:
+                last_all = t
+            # Сначала часы; дни дополняются ниже из изменившихся часов
+            for buckets in (hourly, delta):
+                add_row(buckets, (hour, sid), inc, 1, active)
+                add_row(buckets, (hour, all_id), inc, 1, active_all)
+        if last_all is not None:
+            last[all_id] = last_all
+        self.add_days(delta)
+        self.count = n
+
+    def add_days(self, hours):
+        for (hour, sid), row in hours.items():
+            add_row(self.daily, (hour * HOUR // DAY, sid), *row)
+
+    @classmethod
+    def merged(cls, store, parts):
+        # Сумма итогов нескольких хранилищ; id скиллов переводятся в id store
+        rollup = cls(store)
+        for part in parts:
+            remap = {sid: store.skill_id(skill) for sid, skill in enumerate(part.store.skills)}
+            remap[cls.ALL] = cls.ALL
+            for target, source in ((rollup.hourly, part.hourly), (rollup.daily, part.daily)):
+                for (bucket, sid), row in source.items():
+                    add_row(target, (bucket, remap[sid]), *row)
+            for sid, t in part.last.items():
+                if t > rollup.last.get(remap[sid], t - 1):
+                    rollup.last[remap[sid]] = t
+        rollup.count = len(store)
+        return rollup
+
+    def pack(self):
+        # Часовые итоги для кэша: ключи и значения в массивах; дневные выводятся из часовых
+        keys = array.array('q')
+        values = array.array('d')
+        for (hour, sid), row in self.hourly.items():
+            keys.append(hour << 16 | (sid & 0xFFFF))
+            values.extend(row)
+        last = array.array('q')
+        for sid, t in self.last.items():
+            last.extend((sid, t))
+        return keys.tobytes(), values.tobytes(), last.tobytes()
+
+    def unpack(self, keys_blob, values_blob, last_blob):
+        keys = array.array('q')
+        keys.frombytes(keys_blob)
+        values = array.array('d')
+        values.frombytes(values_blob)
+        last = array.array('q')
+        last.frombytes(last_blob)
+        for i, key in enumerate(keys):
+            sid = key & 0xFFFF
+            hour_key = (key >> 16, self.ALL if sid == 0xFFFF else sid)
+            self.hourly[hour_key] = [values[3 * i], int(values[3 * i + 1]), int(values[3 * i + 2])]
+        self.add_days(self.hourly)
+        self.last = dict(zip(last[::2], last[1::2]))
+        self.count = len(self.store)
+
+    def skill_key(self, skill):
+        # id для запросов: None — все скиллы
+        return self.ALL if skill is None else self.store.skill_index.get(skill)
+
+    def hour(self, hour, skill=None):
+        return self.hourly.get((hour, self.skill_key(skill)), (0.0, 0, 0))
+
+    def day(self, day, skill=None):
+        return self.daily.get((day, self.skill_key(skill)), (0.0, 0, 0))
+
+
+class SkillRate:
+    # Потоковая оценка скорости одного скилла, O(1) на событие:
+    # экспоненциальное среднее скорости между соседними событиями и взвешенная
+    # линейная регрессия значения по активному времени (x — секунды до последнего
+    # события). Паузы длиннее порога в активное время не входят.
+    __slots__ = ('pos', 'last_ts', 'last_value', 'offset', 'active', 'pairs',
+                 'ewma', 'sw', 'sx', 'sxx', 'sy', 'sxy')
+
+    def __init__(self, pos):
+        self.pos = pos          # сколько событий скилла уже учтено
+        self.last_ts = None
+        self.last_value = 0.0
+        self.offset = 0.0       # прирост за паузами: вычитается, чтобы ряд был непрерывным
+        self.active = 0         # активное время, сек
+        self.pairs = 0
+        self.ewma = 0.0         # прирост за час
+        self.sw = self.sx = self.sxx = self.sy = self.sxy = 0.0
+
+    def add(self, t, value, gap, tau):
+        if self.last_ts is None:
+            self.last_ts, self.last_value = t, value
+            self.sw, self.sy = 1.0, value
+            return
+        dt = t - self.last_ts
+        if dt <= 0:
+            return  # прирост в ту же секунду войдёт в следующую пару
+        if dt > gap:
+            self.offset += value - self.last_value
+            self.last_ts, self.last_value = t, value
+            return
+        rate = (value - self.last_value) / dt * 3600
+        decay = math.exp(-dt / tau)
+        self.ewma = rate if not self.pairs else rate + decay * (self.ewma - rate)
+        # Старые точки сдвигаются на dt назад по x и теряют вес
+        sw, sx, sy = self.sw, self.sx, self.sy
+        self.sxx = decay * (self.sxx - 2 * dt * sx + dt * dt * sw)
+        self.sxy = decay * (self.sxy - dt * sy)
+        self.sx = decay * (sx - dt * sw)
+        self.sw = decay * sw + 1
+        self.sy = decay * sy + value - self.offset
+        self.active += dt
+        self.pairs += 1
+        self.last_ts, self.last_value = t, value
+
+    def rate(self):
+        # Прирост за час активной игры: наклон регрессии, пока точек мало — среднее
+        if not self.pairs:
+            return None
+        den = self.sw * self.sxx - self.sx * self.sx
+        if self.pairs >= 2 and den > 1e-9:
+            return (self.sw * self.sxy - self.sx * self.sy) / den * 3600
+        return self.ewma
+
+    def eta(self, target):
+        # Часы активной игры до значения target; None — скилл не растёт
+        rate = self.rate()
+        if not rate or rate <= 0 or target <= self.last_value:
+            return None
+        return (target - self.last_value) / rate
+
+
+class RateTracker:
+    # Оценки SkillRate по скиллам для одного порога паузы (мин). Скилл считается
+    # при первом запросе по своим событиям из SkillTotals, дальше — только новые.
+    # Вес события падает вдвое за TAU * ln 2 активного времени, поэтому история
+    # берётся не глубже WARMUP последних событий скилла.
+    TAU = 30 * 60
+    WARMUP = 10000
+
+    def __init__(self, store, gap_minutes):
+        self.store = store
+        self.gap = gap_minutes * 60
+        self.states = {}  # id скилла -> SkillRate
+
+    def skill(self, skill):
+        sid = self.store.skill_index.get(skill)
+        if sid is None:
+            return None
+        positions = self.store.skill_totals().positions[sid]
+        state = self.states.get(sid)
+        if state is None:
+            state = self.states[sid] = SkillRate(max(0, len(positions) - self.WARMUP))
+        ts, values = self.store.ts, self.store.values
+        gap, tau = self.gap, self.TAU
+        for i in positions[state.pos:]:
+            state.add(ts[i], values[i], gap, tau)
+        state.pos = len(positions)
+        return state
+
+    def update_all(self):
+        for skill in self.store.skills:
+            self.skill(skill)
+
+
+def next_target(value, target=None):
+    # Цель для ETA: заданная, если скилл до неё ещё не дорос, иначе следующий целый уровень
+    if target is not None and target > value:
+        return target
+    # (значения в логе с 6 знаками: 27,99999999 после сложений — это уже 28)
+    return math.floor(round(value, 6)) + 1
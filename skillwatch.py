@@ -0,0 +1,248 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+# --- Слежение за лог-файлами ---
+# Изменения узнаются от ОС (inotify в Linux, уведомления об изменении папки в Windows),
+# без них — опросом, который реже проверяет файл, пока тот не меняется.
+# Серия записей подряд сливается в одно уведомление.
+DEBOUNCE = 0.1     # уведомлять после стольких секунд без новых записей,
+MAX_DELAY = 0.5    # но не позже, чем через столько после первой
+POLL_MIN = 0.25    # опрос: после изменения файл проверяется часто,
+POLL_MAX = 5.0     # без изменений интервал растёт до POLL_MAX
+POLL_GROWTH = 1.5
+SAFETY_POLL = 5.0  # проверка размера даже при уведомлениях от ОС: они бывают с задержкой
+STOP_CHECK = 1.0   # как часто поток проверяет, не пора ли остановиться
+
+
+def file_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class PollingWatcher:
+    # wait(timeout) -> множество изменившихся файлов (пустое, если за timeout ничего не было)
+    def __init__(self, paths):
+        self.states = {path: file_state(path) for path in paths}
+        self.interval = POLL_MIN
+        self.next_check = time.monotonic() + self.interval
+
+    def wait(self, timeout):
+        now = time.monotonic()
+        if self.next_check > now:
+            time.sleep(min(self.next_check - now, timeout))
+            if time.monotonic() < self.next_check:
+                return set()
+        return self.check()
+
+    def check(self):
+        # Сравнивает размер и время файлов с прошлыми, назначает следующую проверку
+        changed = set()
+        for path, state in self.states.items():
+            new_state = file_state(path)
+            if new_state != state:
+                self.states[path] = new_state
+                changed.add(path)
+        if changed:
+            self.interval = POLL_MIN
+        else:
+            self.interval = min(self.interval * POLL_GROWTH, POLL_MAX)
+        self.next_check = time.monotonic() + self.interval
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    # Следим за папками: так видно и запись в файл, и его замену или создание заново
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.paths = {os.path.abspath(path): path for path in paths}
+        self.dirs = {}  # дескриптор слежения -> папка
+        mask = (self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE
+                | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE)
+        for directory in {os.path.dirname(path) for path in self.paths}:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if wd < 0:
+                error = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(error, "inotify_add_watch", directory)
+            self.dirs[wd] = directory
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        pos = 0
+        while pos + self.EVENT.size <= len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, pos)
+            pos += self.EVENT.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            directory = self.dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = self.paths.get(os.path.join(directory, os.fsdecode(name)))
+            if path is not None:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class WindowsWatcher:
+    # FindFirstChangeNotification сообщает об изменении в папке,
+    # какой именно файл изменился — проверяется по размеру и времени.
+    # Запись в файл, открытый игрой, Windows сообщает только при сбросе кэша на диск,
+    # поэтому файлы ещё и опрашиваются, как в PollingWatcher: часто, пока пишутся
+    FILE_NOTIFY_CHANGE_FILE_NAME = 0x1
+    FILE_NOTIFY_CHANGE_SIZE = 0x8
+    FILE_NOTIFY_CHANGE_LAST_WRITE = 0x10
+    WAIT_OBJECT_0 = 0
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+    def __init__(self, paths):
+        from ctypes import wintypes
+        kernel32 = self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        kernel32.FindFirstChangeNotificationW.argtypes = [wintypes.LPCWSTR, wintypes.BOOL, wintypes.DWORD]
+        kernel32.FindFirstChangeNotificationW.restype = wintypes.HANDLE
+        kernel32.FindNextChangeNotification.argtypes = [wintypes.HANDLE]
+        kernel32.FindCloseChangeNotification.argtypes = [wintypes.HANDLE]
+        kernel32.WaitForMultipleObjects.argtypes = [
+            wintypes.DWORD, ctypes.POINTER(wintypes.HANDLE), wintypes.BOOL, wintypes.DWORD
+        ]
+        kernel32.WaitForMultipleObjects.restype = wintypes.DWORD
+        self.poller = PollingWatcher(paths)
+        self.dirs = sorted({os.path.dirname(os.path.abspath(path)) for path in paths})
+        mask = self.FILE_NOTIFY_CHANGE_FILE_NAME | self.FILE_NOTIFY_CHANGE_SIZE | self.FILE_NOTIFY_CHANGE_LAST_WRITE
+        handles = []
+        for directory in self.dirs:
+            handle = kernel32.FindFirstChangeNotificationW(directory, False, mask)
+            if handle in (None, self.INVALID_HANDLE_VALUE):
+                error = ctypes.get_last_error()
+                for h in handles:
+                    kernel32.FindCloseChangeNotification(h)
+                raise ctypes.WinError(error)
+            handles.append(handle)
+        self.handles = (wintypes.HANDLE * len(handles))(*handles)
+
+    def wait(self, timeout):
+        # Ждём уведомления не дольше, чем до следующего опроса
+        delay = max(0.0, min(timeout, self.poller.next_check - time.monotonic()))
+        result = self.kernel32.WaitForMultipleObjects(len(self.handles), self.handles, False, int(delay * 1000))
+        index = result - self.WAIT_OBJECT_0
+        if 0 <= index < len(self.handles):
+            self.kernel32.FindNextChangeNotification(self.handles[index])
+        elif time.monotonic() < self.poller.next_check:
+            return set()
+        return self.poller.check()
+
+    def close(self):
+        for handle in self.handles:
+            self.kernel32.FindCloseChangeNotification(handle)
+
+
+def create_watcher(paths):
+    # Уведомления ОС, если доступны, иначе опрос
+    try:
+        if sys.platform.startswith('linux'):
+            return InotifyWatcher(paths)
+        if sys.platform == 'win32':
+            return WindowsWatcher(paths)
+    except (OSError, AttributeError):
+        pass
+    return PollingWatcher(paths)
+
+
+class LogWatcher:
+    # Следит за файлами в фоновом потоке. on_change(paths) вызывается из этого потока
+    # с множеством изменившихся файлов, когда серия записей закончилась.
+    # С pattern (regex имени файла) сообщает и о новых подходящих файлах в тех же папках —
+    # их ищет проверка раз в SAFETY_POLL.
+    def __init__(self, paths, on_change, pattern=None):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.pattern = pattern
+        self.stopped = threading.Event()
+        self.thread = None
+        self.kind = None
+
+    def start(self):
+        # Состояние файлов запоминается до запуска потока: запись, сделанная, пока
+        # поток подписывается на уведомления, найдёт проверка раз в SAFETY_POLL
+        self.states = {path: file_state(path) for path in self.paths}
+        self.known = self.folder_files()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def folder_files(self):
+        if self.pattern is None:
+            return set()
+        files = set()
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in self.paths}:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            files.update(os.path.join(directory, name) for name in names if self.pattern.match(name))
+        return files
+
+    def run(self):
+        watcher = create_watcher(self.paths)
+        self.kind = type(watcher).__name__
+        states, known = self.states, self.known
+        last_check = time.monotonic()
+        try:
+            while not self.stopped.is_set():
+                changed = watcher.wait(STOP_CHECK)
+                if not changed and time.monotonic() - last_check >= SAFETY_POLL:
+                    # Страховка от запоздавших или потерянных уведомлений
+                    last_check = time.monotonic()
+                    changed = {path for path in self.paths if file_state(path) != states[path]}
+                    new = self.folder_files() - known
+                    known |= new
+                    changed |= new
+                if not changed:
+                    continue
+                first = time.monotonic()
+                while time.monotonic() - first < MAX_DELAY and not self.stopped.is_set():
+                    more = watcher.wait(DEBOUNCE)
+                    if not more:
+                        break
+                    changed |= more
+                last_check = time.monotonic()
+                for path in self.paths:
+                    states[path] = file_state(path)
+                if not self.stopped.is_set():
+                    self.on_change(changed)
+        finally:
+            watcher.close()